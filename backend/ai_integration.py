@@ -3,9 +3,21 @@ AI Integration Module for Document Generation and Improvement
 Supports OpenAI (ChatGPT), Google (Gemini), and DeepSeek
 """
 
-import sqlite3
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple, Union
+from collections import Counter, defaultdict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import asyncio
+import functools
 import json
+import hashlib
+import logging
+import random
+import re
+import signal
+import threading
+import time
 
 # AI Provider imports
 try:
@@ -20,27 +32,472 @@ try:
 except ImportError:
     GOOGLE_AVAILABLE = False
 
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
 import httpx
+import orjson
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+from db import read_conn, write_conn
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a _build_*_prompt template changes so stale cached responses are ignored
+PROMPT_VERSION = "4"
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Static instructions go in the system message so the identical prefix is served
+# from the provider's prompt cache; _build_*_prompt only renders per-request fields
+DEFAULT_SYSTEM_PROMPT = "You are an expert compliance document writer."
+
+GENERATION_SYSTEM_PROMPT = """You are a compliance document expert. Generate comprehensive compliance documents for the requirement you are given.
+
+Requirements:
+1. Create a professional, compliant document of the requested type that addresses all aspects of the clause
+2. Include clear objectives, scope, responsibilities, and procedures
+3. Use industry best practices and appropriate terminology
+4. Format with proper headers, sections, and structure
+5. Include placeholders for company-specific information (e.g., [COMPANY NAME])
+6. Ensure the document would satisfy audit requirements
+
+Generate a complete, ready-to-use document."""
+
+IMPROVEMENT_SYSTEM_PROMPT = """You are a compliance auditor. Analyze the document you are given against its clause and provide improvement suggestions.
+
+Provide your response in this JSON format:
+{
+    "compliance_score": <0-100>,
+    "gaps": ["gap 1", "gap 2", ...],
+    "suggestions": ["suggestion 1", "suggestion 2", ...],
+    "critical_issues": ["issue 1", "issue 2", ...],
+    "improved_sections": {
+        "section_name": "improved text"
+    }
+}
+
+Focus on:
+1. Completeness - does it address all clause requirements?
+2. Clarity - is it clear and unambiguous?
+3. Structure - is it well-organized?
+4. Compliance - does it meet audit standards?
+5. Practical - is it implementable?"""
+
+# User-message bodies as bound str.format templates, built once at import;
+# _build_*_prompt only supplies the per-request fields
+_render_generation_prompt = """Generate a {doc_type} document for the following compliance requirement:
+
+Standard: {name} {version}
+Clause: {clause_number} - {title}
+Description: {description}""".format
+
+_render_improvement_prompt = """Standard: {name} {version}
+Clause: {clause_number} - {title}
+Required: {description}
+
+Current Document:
+{content}""".format
+
+# Document content sent for analysis is normalised and cut to this many tokens
+MAX_CONTENT_TOKENS = 2000
+# Rough chars-per-token ratio used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+# Page headers/footers: a line within PAGE_EDGE_LINES of the top or bottom of a page (pages
+# split on form feeds) that recurs at the same offset on at least REPEATED_LINE_THRESHOLD
+# pages, digits ignored so "Page 3 of 9" counts. Repeated lines elsewhere are real content.
+REPEATED_LINE_THRESHOLD = 3
+PAGE_EDGE_LINES = 2
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_DIGITS_RE = re.compile(r"\d+")
+
+# Concurrency cap for online fan-out and polling cadence for offline batch jobs
+MAX_CONCURRENT_GENERATIONS = 10
+BATCH_POLL_INTERVAL = 60
+
+# Semantic cache for improve_document: near-duplicate documents reuse a previous analysis
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+
+_embedding_model = None
+
+# Shared async HTTP client so concurrent LLM calls reuse pooled connections
+_async_client: Optional[httpx.AsyncClient] = None
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the process-wide async HTTP client, creating it on first use"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+        )
+    return _async_client
+
+# DeepSeek gets its own keep-alive pool; HTTP/2 multiplexes concurrent generations
+# over a single connection when the h2 package is installed
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+_deepseek_client: Optional[httpx.AsyncClient] = None
+
+def get_deepseek_client() -> httpx.AsyncClient:
+    """Return the process-wide DeepSeek client, creating it on first use"""
+    global _deepseek_client
+    if _deepseek_client is None or _deepseek_client.is_closed:
+        _deepseek_client = httpx.AsyncClient(
+            base_url=DEEPSEEK_BASE_URL,
+            timeout=httpx.Timeout(60.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            http2=HTTP2_AVAILABLE
+        )
+    return _deepseek_client
+
+async def close_async_client():
+    """Close the shared async HTTP clients"""
+    global _async_client, _deepseek_client
+    # Cached provider clients hold a reference to the clients being closed
+    _build_http_client.cache_clear()
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _deepseek_client is not None:
+        await _deepseek_client.aclose()
+        _deepseek_client = None
+
+def _get_embedding_model():
+    """Load the sentence embedding model once, on first use"""
+    global _embedding_model
+    if _embedding_model is None:
+        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+# ==================== Provider Resilience ====================
+
+# Error message fragments that indicate a transient, retryable provider failure
+RETRYABLE_ERROR_PATTERNS = ("rate limit", "429", "502", "503", "504", "timeout", "overloaded")
+
+class CircuitOpen(Exception):
+    """Raised when a provider's circuit breaker is open and calls fail fast"""
+
+class RateLimiter:
+    """Sliding one-minute window limiter for outbound provider calls"""
+    
+    def __init__(self, max_per_min: int = 50):
+        self.max_per_min = max_per_min
+        self.calls = deque()
+    
+    async def acquire(self):
+        """Wait until another call fits inside the window"""
+        while True:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0] >= 60:
+                self.calls.popleft()
+            if len(self.calls) < self.max_per_min:
+                self.calls.append(now)
+                return
+            await asyncio.sleep(60 - (now - self.calls[0]))
+
+class ResilientLLM:
+    """
+    Decorator adding rate limiting, retry with exponential backoff and a
+    circuit breaker to an async provider call.
+    
+    Each decorated method gets its own instance, so state is per provider.
+    """
+    
+    def __init__(self, max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 32.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, max_per_min: int = 50):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.rate_limiter = RateLimiter(max_per_min=max_per_min)
+        self.circuit_state = "closed"
+        self.failure_count = 0
+        self.reset_at = 0.0
+    
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.call(func, *args, **kwargs)
+        return wrapper
+    
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Check whether an error looks like a transient provider failure"""
+        message = f"{type(error).__name__} {error}".lower()
+        return any(pattern in message for pattern in RETRYABLE_ERROR_PATTERNS)
+    
+    def _check_circuit(self):
+        if self.circuit_state == "open":
+            if time.monotonic() < self.reset_at:
+                raise CircuitOpen("Provider temporarily unavailable, please retry shortly")
+            self.circuit_state = "half_open"
+    
+    def _record_success(self):
+        self.circuit_state = "closed"
+        self.failure_count = 0
+    
+    def _record_failure(self):
+        self.failure_count += 1
+        if self.circuit_state == "half_open" or self.failure_count >= self.failure_threshold:
+            self.circuit_state = "open"
+            self.reset_at = time.monotonic() + self.reset_timeout
+    
+    async def call(self, func, *args, **kwargs):
+        """Run func, retrying transient failures and tripping the circuit on repeated ones"""
+        self._check_circuit()
+        
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self.rate_limiter.acquire()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    if not self.is_retryable(e):
+                        raise
+                    if attempt == self.max_retries:
+                        self._record_failure()
+                        raise
+                    delay = min(self.base_delay * 2 ** attempt + random.random() * 0.25, self.max_delay)
+                    await asyncio.sleep(delay)
+                else:
+                    self._record_success()
+                    return result
+        except BaseException:
+            # A failed trial call of any kind (non-retryable, cancelled) re-opens the
+            # circuit; otherwise it would stay half open and let every call through
+            if self.circuit_state == "half_open":
+                self._record_failure()
+            raise
+
+# ==================== Adaptive Timeouts ====================
+
+@dataclass
+class TimeoutConfig:
+    """Baseline request timeouts per call type, in milliseconds"""
+    default: int = 30_000
+    fast: int = 10_000
+    batch: int = 60_000
+    streaming: int = 30_000
+    max: int = 120_000
+    
+    def field_for(self, call_type: str) -> str:
+        """Name of the field holding a call type's baseline ("regular" uses the default)"""
+        return call_type if call_type in ("fast", "batch", "streaming") else "default"
+
+TIMEOUT_CONFIG = TimeoutConfig()
+TIMEOUT_HISTORY_SIZE = 100
+CONNECT_TIMEOUT = 5.0
+
+# Recent successful call durations (ms), keyed on (provider, call_type)
+timeout_history: Dict[Tuple[str, str], deque] = defaultdict(
+    lambda: deque(maxlen=TIMEOUT_HISTORY_SIZE)
+)
+
+def _p95(samples) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+def get_timeout(provider: str, call_type: str) -> float:
+    """Timeout in seconds: 1.5x the observed p95, floored at the call type's baseline"""
+    base = getattr(TIMEOUT_CONFIG, TIMEOUT_CONFIG.field_for(call_type))
+    history = timeout_history[(provider, call_type)]
+    timeout_ms = max(_p95(history) * 1.5, base) if history else base
+    return min(timeout_ms, TIMEOUT_CONFIG.max) / 1000
+
+def record_duration(provider: str, call_type: str, duration_ms: float):
+    """Remember how long a successful call took"""
+    timeout_history[(provider, call_type)].append(duration_ms)
+
+def record_timeout(call_type: str):
+    """Raise a call type's baseline after it times out, up to the configured max"""
+    attr = TIMEOUT_CONFIG.field_for(call_type)
+    setattr(TIMEOUT_CONFIG, attr, min(int(getattr(TIMEOUT_CONFIG, attr) * 1.5), TIMEOUT_CONFIG.max))
+
+# ==================== Request Audit Buffer ====================
+
+AUDIT_INSERTS = {
+    "llm_cache": """INSERT OR REPLACE INTO llm_cache
+        (input_hash, provider, model, prompt_version, response, created_at, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)""",
+    "ai_call_log": """INSERT INTO ai_call_log
+        (provider, model, call_type, duration_ms, cache_hit, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)""",
+    "ai_token_usage": """INSERT INTO ai_token_usage
+        (provider, model, prompt_tokens, completion_tokens, created_at)
+        VALUES (?, ?, ?, ?, ?)""",
+}
+
+# Rows buffered for the current request, keyed by table (None outside audit_scope)
+_audit_rows: ContextVar[Optional[Dict[str, List[tuple]]]] = ContextVar("audit_rows", default=None)
+
+def _flush_audit(rows: Dict[str, List[tuple]]):
+    """Write buffered rows with one executemany per table, all in one transaction"""
+    with write_conn() as conn:
+        for table, table_rows in rows.items():
+            conn.executemany(AUDIT_INSERTS[table], table_rows)
+
+async def _audit(rows: Dict[str, List[tuple]]):
+    """Buffer rows for the current request, or write them straight away outside one"""
+    buffered = _audit_rows.get()
+    if buffered is None:
+        await asyncio.to_thread(_flush_audit, rows)
+        return
+    for table, table_rows in rows.items():
+        buffered[table].extend(table_rows)
 
-DB_PATH = "compliance.db"
+@asynccontextmanager
+async def audit_scope():
+    """Collect a request's cache, call log and token rows and commit them together"""
+    rows = defaultdict(list)
+    token = _audit_rows.set(rows)
+    try:
+        yield
+    finally:
+        _audit_rows.reset(token)
+        if rows:
+            await asyncio.to_thread(_flush_audit, rows)
+
+# ==================== Response Parsing ====================
+
+def _iter_balanced(text: str, open_char: str, close_char: str):
+    """
+    Yield each top-level balanced open_char...close_char span in a single pass.
+    Brackets inside JSON string literals are ignored.
+    """
+    depth = 0
+    start = 0
+    in_string = False
+    escaped = False
+    
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == open_char:
+            if depth == 0:
+                start = i
+            depth += 1
+        elif depth > 0:
+            if ch == '"':
+                in_string = True
+            elif ch == close_char:
+                depth -= 1
+                if depth == 0:
+                    yield text[start:i + 1]
+
+def _compress_content(content: str) -> str:
+    """Drop page header/footer lines and collapse whitespace"""
+    pages = [
+        [line.strip() for line in page.splitlines() if line.strip()]
+        for page in content.split("\f")
+    ]
+    
+    def edge_keys(page):
+        """(offset from the top or bottom, line) for each line near a page edge"""
+        keys = {}
+        for offset in range(min(PAGE_EDGE_LINES, len(page))):
+            keys[offset] = (offset, _DIGITS_RE.sub("#", page[offset]))
+            keys[len(page) - 1 - offset] = (-1 - offset, _DIGITS_RE.sub("#", page[-1 - offset]))
+        return keys
+    
+    page_edges = [edge_keys(page) for page in pages]
+    edge_counts = Counter(key for edges in page_edges for key in set(edges.values()))
+    
+    kept = [
+        line
+        for page, edges in zip(pages, page_edges)
+        for i, line in enumerate(page)
+        if i not in edges or edge_counts[edges[i]] < REPEATED_LINE_THRESHOLD
+    ]
+    return _WHITESPACE_RE.sub(" ", " ".join(kept)).strip()
+
+# ==================== Client Construction ====================
+
+DEFAULT_MODELS = {
+    "openai": "gpt-4",
+    "google": "gemini-pro",
+    "deepseek": "deepseek-chat",
+}
+
+# Chat models that accept response_format={"type": "json_object"}; others (including
+# plain gpt-4, the default) reject it with a 400 and rely on _parse_improvement_response alone
+JSON_OBJECT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125",
+                      "gpt-3.5-turbo-1106", "gpt-3.5-turbo-0125", "deepseek-chat")
+
+def _supports_json_object(model_name: Optional[str]) -> bool:
+    """Whether a model accepts the json_object response format"""
+    return bool(model_name) and (model_name == "gpt-3.5-turbo" or model_name.startswith(JSON_OBJECT_MODELS))
+
+# Approximate input price per 1K tokens (USD) of each provider's default model,
+# used to restrict provider racing to cheap providers
+PROVIDER_COST_PER_1K = {
+    "openai": 0.03,
+    "google": 0.0005,
+    "deepseek": 0.00014,
+}
+
+def _build_client(provider: str, model_name: str, api_key: str):
+    """Construct the client for a provider"""
+    if provider == "google" and GOOGLE_AVAILABLE:
+        # Not cached: the API key lives in genai's process-wide configuration,
+        # so _stream_google sets it again before each request
+        return genai.GenerativeModel(model_name)
+    return _build_http_client(provider, api_key)
+
+@functools.lru_cache(maxsize=4)
+def _build_http_client(provider: str, api_key: str):
+    """Construct (once per provider/key) a client on the shared async HTTP clients"""
+    if provider == "openai" and OPENAI_AVAILABLE:
+        return openai.AsyncOpenAI(api_key=api_key, http_client=get_async_client())
+    
+    elif provider == "deepseek":
+        # DeepSeek uses OpenAI-compatible API
+        return get_deepseek_client()
+    
+    return None
 
 class AIDocumentAssistant:
     """AI-powered document generation and improvement assistant"""
     
-    def __init__(self):
+    def __init__(self, provider: Optional[str] = None, api_key: Optional[str] = None,
+                 model_name: Optional[str] = None):
         self.provider = None
         self.api_key = None
         self.model_name = None
         self.client = None
-        self._load_config()
+        self._encoder = None
+        
+        if provider:
+            # Explicit provider (e.g. a racing contender) instead of the active config
+            self.provider, self.api_key, self.model_name = provider, api_key, model_name
+            self._initialize_client()
+        else:
+            self._load_config()
     
     def _load_config(self):
-        """Load active AI configuration from database"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT provider, api_key, model_name FROM ai_config WHERE is_active = 1")
-        config = cursor.fetchone()
-        conn.close()
+        """Load active AI configuration from the in-memory CONFIG"""
+        config = get_config()["active"]
         
         if config:
             self.provider, self.api_key, self.model_name = config
@@ -48,24 +505,11 @@ class AIDocumentAssistant:
     
     def _initialize_client(self):
         """Initialize the appropriate AI client"""
-        if self.provider == "openai" and OPENAI_AVAILABLE:
-            openai.api_key = self.api_key
-            self.client = openai
-            if not self.model_name:
-                self.model_name = "gpt-4"
-        
-        elif self.provider == "google" and GOOGLE_AVAILABLE:
-            genai.configure(api_key=self.api_key)
-            if not self.model_name:
-                self.model_name = "gemini-pro"
-            self.client = genai.GenerativeModel(self.model_name)
-        
-        elif self.provider == "deepseek":
-            # DeepSeek uses OpenAI-compatible API
-            if not self.model_name:
-                self.model_name = "deepseek-chat"
+        if not self.model_name:
+            self.model_name = DEFAULT_MODELS.get(self.provider)
+        self.client = _build_client(self.provider, self.model_name, self.api_key)
     
-    def generate_document(self, clause_info: Dict, standard_info: Dict, 
+    async def generate_document(self, clause_info: Dict, standard_info: Dict, 
                          document_type: str = "procedure") -> str:
         """
         Generate a new compliance document
@@ -82,17 +526,59 @@ class AIDocumentAssistant:
             raise ValueError("AI client not configured. Please configure AI settings first.")
         
         prompt = self._build_generation_prompt(clause_info, standard_info, document_type)
+        return await self._cached_generate(prompt, call_type="regular",
+                                           system_prompt=GENERATION_SYSTEM_PROMPT)
+    
+    async def generate_document_racing(self, clause_info: Dict, standard_info: Dict,
+                                       document_type: str = "procedure",
+                                       providers: Tuple[str, ...] = ("openai", "deepseek"),
+                                       max_cost_per_1k: Optional[float] = None) -> str:
+        """
+        Generate a new compliance document by racing several providers
+        
+        The first provider to return successfully wins; the others are cancelled.
+        
+        Args:
+            clause_info: Dict with clause_number, title, description
+            standard_info: Dict with standard name, version
+            document_type: Type of document to generate
+            providers: Providers to race (each needs a saved configuration)
+            max_cost_per_1k: Only race providers at or below this input cost (USD per 1K tokens)
+        
+        Returns:
+            Generated document content from the fastest provider
+        """
+        prompt = self._build_generation_prompt(clause_info, standard_info, document_type)
+        contenders = _load_racing_assistants(providers, max_cost_per_1k)
+        if not contenders:
+            raise ValueError("No configured providers available to race")
         
-        if self.provider == "openai":
-            return self._generate_openai(prompt)
-        elif self.provider == "google":
-            return self._generate_google(prompt)
-        elif self.provider == "deepseek":
-            return self._generate_deepseek(prompt)
-        else:
-            raise ValueError(f"Unsupported provider: {self.provider}")
+        tasks = {
+            asyncio.create_task(a._cached_generate(
+                prompt, call_type="regular", system_prompt=GENERATION_SYSTEM_PROMPT
+            )): a.provider
+            for a in contenders
+        }
+        pending = set(tasks)
+        errors = []
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(f"{tasks[task]}: {task.exception()}")
+        finally:
+            # Stop the losers, or every contender if this call itself is cancelled
+            # (client disconnect, timeout), so none keeps spending tokens
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        raise RuntimeError("All providers failed: " + "; ".join(errors))
     
-    def improve_document(self, current_content: str, clause_info: Dict, 
+    async def improve_document(self, current_content: str, clause_info: Dict, 
                         standard_info: Dict) -> Dict[str, any]:
         """
         Analyze and suggest improvements for existing document
@@ -108,143 +594,407 @@ class AIDocumentAssistant:
         if not self.client:
             raise ValueError("AI client not configured")
         
+        # Clause numbers repeat across standards, so scope by the clause's primary key
+        if 'id' in clause_info:
+            clause_id = str(clause_info['id'])
+        else:
+            clause_id = f"{standard_info['name']}:{clause_info['clause_number']}"
+        embedding = None
+        if SEMANTIC_CACHE_AVAILABLE:
+            embedding = await asyncio.to_thread(
+                self._embed, current_content[:3000] + clause_info['clause_number']
+            )
+            cached = await asyncio.to_thread(self._semantic_lookup, clause_id, embedding)
+            if cached is not None:
+                return self._parse_improvement_response(cached)
+        
         prompt = self._build_improvement_prompt(current_content, clause_info, standard_info)
+        response = await self._cached_generate(
+            prompt, json_mode=True, system_prompt=IMPROVEMENT_SYSTEM_PROMPT
+        )
         
-        if self.provider == "openai":
-            response = self._generate_openai(prompt)
-        elif self.provider == "google":
-            response = self._generate_google(prompt)
-        elif self.provider == "deepseek":
-            response = self._generate_deepseek(prompt)
-        else:
-            raise ValueError(f"Unsupported provider: {self.provider}")
+        if embedding is not None:
+            await asyncio.to_thread(
+                self._semantic_store, current_content, clause_id, embedding, response
+            )
         
         return self._parse_improvement_response(response)
     
+    def _embed(self, text: str) -> "np.ndarray":
+        """Embed text as a unit-length float16 vector"""
+        vector = _get_embedding_model().encode(text, normalize_embeddings=True)
+        return np.asarray(vector, dtype=np.float16)
+    
+    def _semantic_lookup(self, clause_id: str, embedding: "np.ndarray") -> Optional[str]:
+        """Return a cached response for a near-identical document on the same clause"""
+        with read_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT embedding, response FROM doc_embeddings
+                   WHERE clause_id = ? AND provider = ? AND model = ? AND prompt_version = ?
+                     AND expires_at > ?""",
+                (clause_id, self.provider, self.model_name, PROMPT_VERSION, int(time.time()))
+            )
+            rows = cursor.fetchall()
+        
+        if not rows:
+            return None
+        
+        # Few rows per clause, so a brute-force dot product is enough
+        cached = np.stack([np.frombuffer(r[0], dtype=np.float16) for r in rows])
+        similarities = cached.astype(np.float32) @ embedding.astype(np.float32)
+        best = int(np.argmax(similarities))
+        if similarities[best] > SEMANTIC_CACHE_THRESHOLD:
+            return rows[best][1]
+        return None
+    
+    def _semantic_store(self, content: str, clause_id: str,
+                        embedding: "np.ndarray", response: str):
+        """Remember a response alongside the embedding of the document it analysed"""
+        document_hash = hashlib.sha256(content.encode()).hexdigest()
+        now = int(time.time())
+        with write_conn() as conn:
+            # Lookups scan every row for a clause, so drop expired ones as new ones arrive
+            conn.execute(
+                "DELETE FROM doc_embeddings WHERE clause_id = ? AND expires_at <= ?",
+                (clause_id, now)
+            )
+            conn.execute(
+                """INSERT INTO doc_embeddings
+                   (document_hash, clause_id, provider, model, prompt_version, embedding, response, expires_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (document_hash, clause_id, self.provider, self.model_name, PROMPT_VERSION,
+                 embedding.tobytes(), response, now + CACHE_TTL_SECONDS)
+            )
+    
     def _build_generation_prompt(self, clause_info: Dict, standard_info: Dict, 
                                  doc_type: str) -> str:
         """Build prompt for document generation"""
-        prompt = f"""You are a compliance document expert. Generate a comprehensive {doc_type} document for the following compliance requirement:
-
-Standard: {standard_info['name']} {standard_info.get('version', '')}
-Clause: {clause_info['clause_number']} - {clause_info['title']}
-Description: {clause_info.get('description', '')}
-
-Requirements:
-1. Create a professional, compliant {doc_type} that addresses all aspects of this clause
-2. Include clear objectives, scope, responsibilities, and procedures
-3. Use industry best practices and appropriate terminology
-4. Format with proper headers, sections, and structure
-5. Include placeholders for company-specific information (e.g., [COMPANY NAME])
-6. Ensure the document would satisfy audit requirements
-
-Generate a complete, ready-to-use document."""
+        return _render_generation_prompt(
+            doc_type=doc_type,
+            name=standard_info['name'],
+            version=standard_info.get('version', ''),
+            clause_number=clause_info['clause_number'],
+            title=clause_info['title'],
+            description=clause_info.get('description', '')
+        )
+    
+    def _get_encoder(self):
+        """Tokenizer for the configured model, loaded once per assistant"""
+        if self._encoder is None:
+            try:
+                self._encoder = tiktoken.encoding_for_model(self.model_name)
+            except KeyError:
+                # Non-OpenAI models: cl100k_base is a close enough approximation
+                self._encoder = tiktoken.get_encoding("cl100k_base")
+        return self._encoder
+    
+    def _truncate_content(self, content: str) -> str:
+        """Compress document text and cut it to MAX_CONTENT_TOKENS on a token boundary"""
+        content = _compress_content(content)
+        
+        if not TIKTOKEN_AVAILABLE:
+            return content[:MAX_CONTENT_TOKENS * CHARS_PER_TOKEN]
         
-        return prompt
+        encoder = self._get_encoder()
+        tokens = encoder.encode(content)
+        if len(tokens) <= MAX_CONTENT_TOKENS:
+            return content
+        return encoder.decode(tokens[:MAX_CONTENT_TOKENS])
     
     def _build_improvement_prompt(self, content: str, clause_info: Dict, 
                                   standard_info: Dict) -> str:
         """Build prompt for document improvement"""
-        prompt = f"""You are a compliance auditor. Analyze this document and provide improvement suggestions:
-
-Standard: {standard_info['name']} {standard_info.get('version', '')}
-Clause: {clause_info['clause_number']} - {clause_info['title']}
-Required: {clause_info.get('description', '')}
-
-Current Document:
-{content[:3000]}  # Limit content to avoid token limits
-
-Provide your response in this JSON format:
-{{
-    "compliance_score": <0-100>,
-    "gaps": ["gap 1", "gap 2", ...],
-    "suggestions": ["suggestion 1", "suggestion 2", ...],
-    "critical_issues": ["issue 1", "issue 2", ...],
-    "improved_sections": {{
-        "section_name": "improved text"
-    }}
-}}
-
-Focus on:
-1. Completeness - does it address all clause requirements?
-2. Clarity - is it clear and unambiguous?
-3. Structure - is it well-organized?
-4. Compliance - does it meet audit standards?
-5. Practical - is it implementable?"""
+        return _render_improvement_prompt(
+            name=standard_info['name'],
+            version=standard_info.get('version', ''),
+            clause_number=clause_info['clause_number'],
+            title=clause_info['title'],
+            description=clause_info.get('description', ''),
+            content=self._truncate_content(content)
+        )
+    
+    async def _generate(self, prompt: str, call_type: str = "regular",
+                        json_mode: bool = False,
+                        system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> str:
+        """Dispatch a prompt to the configured provider"""
+        if self.provider == "openai":
+            return await self._generate_openai(prompt, call_type, json_mode, system_prompt)
+        elif self.provider == "google":
+            return await self._generate_google(prompt, call_type, json_mode, system_prompt)
+        elif self.provider == "deepseek":
+            return await self._generate_deepseek_async(prompt, call_type, json_mode, system_prompt)
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+    
+    def _cache_key(self, prompt: str, json_mode: bool = False,
+                   system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> str:
+        """Hash everything that determines a response into a cache key"""
+        payload = json.dumps({
+            "provider": self.provider,
+            "model": self.model_name,
+            "system": system_prompt,
+            "prompt": prompt,
+            "json_mode": json_mode,
+            "prompt_version": PROMPT_VERSION
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    async def _cached_generate(self, prompt: str, call_type: str = "regular",
+                               json_mode: bool = False,
+                               system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> str:
+        """Generate a response, reusing a cached one for an identical prompt"""
+        input_hash = self._cache_key(prompt, json_mode, system_prompt)
+        start = time.monotonic()
+        
+        cached = await asyncio.to_thread(self._cache_get, input_hash)
+        if cached is not None:
+            await _audit({"ai_call_log": [self._call_log_row(call_type, start, cache_hit=True)]})
+            return cached
         
-        return prompt
+        response = await self._generate(prompt, call_type, json_mode, system_prompt)
+        await self._audit_generation(input_hash, call_type, start, system_prompt + prompt, response)
+        return response
     
-    def _generate_openai(self, prompt: str) -> str:
-        """Generate using OpenAI API"""
-        response = self.client.ChatCompletion.create(
+    def _cache_get(self, input_hash: str) -> Optional[str]:
+        """Look up an unexpired cached response"""
+        with read_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT response FROM llm_cache WHERE input_hash = ? AND expires_at > ?",
+                (input_hash, int(time.time()))
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def _call_log_row(self, call_type: str, start: float, cache_hit: bool) -> tuple:
+        """ai_call_log row for a call that began at the given monotonic time"""
+        duration_ms = (time.monotonic() - start) * 1000
+        return (self.provider, self.model_name, call_type, duration_ms, int(cache_hit), int(time.time()))
+    
+    def _count_tokens(self, text: str) -> int:
+        """Token count for usage stats (estimated from length without tiktoken)"""
+        if not TIKTOKEN_AVAILABLE:
+            return len(text) // CHARS_PER_TOKEN
+        return len(self._get_encoder().encode(text))
+    
+    async def _audit_generation(self, input_hash: str, call_type: str, start: float,
+                                prompt: str, response: str):
+        """Buffer the cache entry, call log and token usage for a fresh generation"""
+        now = int(time.time())
+        await _audit({
+            "llm_cache": [(input_hash, self.provider, self.model_name, PROMPT_VERSION,
+                           response, now, now + CACHE_TTL_SECONDS)],
+            "ai_call_log": [self._call_log_row(call_type, start, cache_hit=False)],
+            "ai_token_usage": [(self.provider, self.model_name, self._count_tokens(prompt),
+                                self._count_tokens(response), now)]
+        })
+    
+    async def _with_timeout(self, call_type: str, awaitable, timeout: float):
+        """Await a provider call under a hard deadline and feed the timeout history"""
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            record_timeout(call_type)
+            raise
+        record_duration(self.provider, call_type, (time.monotonic() - start) * 1000)
+        return result
+    
+    def _chat_messages(self, prompt: str, system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> List[Dict]:
+        """Chat messages for OpenAI-compatible providers"""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+    
+    async def _collect_stream(self, chunks) -> str:
+        """Join a token stream into the complete response"""
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk)
+        return "".join(parts)
+    
+    def _stream(self, prompt: str, timeout: float, json_mode: bool = False,
+                system_prompt: str = DEFAULT_SYSTEM_PROMPT):
+        """Token stream from the configured provider"""
+        if self.provider == "openai":
+            return self._stream_openai(prompt, timeout, json_mode, system_prompt)
+        elif self.provider == "google":
+            return self._stream_google(prompt, json_mode, system_prompt)
+        elif self.provider == "deepseek":
+            return self._stream_deepseek(prompt, timeout, json_mode, system_prompt)
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+    
+    async def _stream_openai(self, prompt: str, timeout: float, json_mode: bool = False,
+                             system_prompt: str = DEFAULT_SYSTEM_PROMPT):
+        """Stream tokens from the OpenAI API"""
+        extra = {}
+        if json_mode and _supports_json_object(self.model_name):
+            extra["response_format"] = {"type": "json_object"}
+        stream = await self.client.chat.completions.create(
             model=self.model_name,
-            messages=[
-                {"role": "system", "content": "You are an expert compliance document writer."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self._chat_messages(prompt, system_prompt),
             temperature=0.7,
-            max_tokens=3000
+            max_tokens=3000,
+            stream=True,
+            timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+            **extra
         )
-        return response.choices[0].message.content
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
-    def _generate_google(self, prompt: str) -> str:
-        """Generate using Google Gemini API"""
-        response = self.client.generate_content(prompt)
-        return response.text
+    async def _stream_google(self, prompt: str, json_mode: bool = False,
+                             system_prompt: str = DEFAULT_SYSTEM_PROMPT):
+        """Stream tokens from the Google Gemini API"""
+        # Another assistant may have configured a different key since this one was built
+        genai.configure(api_key=self.api_key)
+        # The pinned google-generativeai (0.3.1) has no system_instruction, so prepend it,
+        # and no JSON response mode: json_mode output goes to _parse_improvement_response as text
+        response = await self.client.generate_content_async(
+            system_prompt + "\n\n" + prompt, stream=True
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
     
-    def _generate_deepseek(self, prompt: str) -> str:
-        """Generate using DeepSeek API (OpenAI-compatible)"""
-        url = "https://api.deepseek.com/v1/chat/completions"
+    async def _stream_deepseek(self, prompt: str, timeout: float, json_mode: bool = False,
+                               system_prompt: str = DEFAULT_SYSTEM_PROMPT):
+        """Stream tokens from the DeepSeek API (OpenAI-compatible server-sent events)"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         data = {
             "model": self.model_name,
-            "messages": [
-                {"role": "system", "content": "You are an expert compliance document writer."},
-                {"role": "user", "content": prompt}
-            ],
+            "messages": self._chat_messages(prompt, system_prompt),
             "temperature": 0.7,
-            "max_tokens": 3000
+            "max_tokens": 3000,
+            "stream": True
         }
+        if json_mode and _supports_json_object(self.model_name):
+            data["response_format"] = {"type": "json_object"}
         
-        response = httpx.post(url, headers=headers, json=data, timeout=60.0)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        async with self.client.stream(
+            "POST", "/chat/completions", headers=headers, content=orjson.dumps(data),
+            timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                delta = orjson.loads(payload)["choices"][0]["delta"].get("content")
+                if delta:
+                    yield delta
+    
+    # Non-streaming entry points: collect the stream so a timeout cancels it mid-generation
+    
+    @ResilientLLM()
+    async def _generate_openai(self, prompt: str, call_type: str = "regular",
+                               json_mode: bool = False,
+                               system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> str:
+        """Generate using OpenAI API"""
+        timeout = get_timeout(self.provider, call_type)
+        return await self._with_timeout(
+            call_type, self._collect_stream(self._stream_openai(prompt, timeout, json_mode, system_prompt)), timeout
+        )
+    
+    @ResilientLLM()
+    async def _generate_google(self, prompt: str, call_type: str = "regular",
+                               json_mode: bool = False,
+                               system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> str:
+        """Generate using Google Gemini API"""
+        timeout = get_timeout(self.provider, call_type)
+        return await self._with_timeout(
+            call_type, self._collect_stream(self._stream_google(prompt, json_mode, system_prompt)), timeout
+        )
+    
+    @ResilientLLM()
+    async def _generate_deepseek_async(self, prompt: str, call_type: str = "regular",
+                                       json_mode: bool = False,
+                                       system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> str:
+        """Generate using DeepSeek API (OpenAI-compatible)"""
+        timeout = get_timeout(self.provider, call_type)
+        return await self._with_timeout(
+            call_type, self._collect_stream(self._stream_deepseek(prompt, timeout, json_mode, system_prompt)), timeout
+        )
+    
+    async def stream_document(self, clause_info: Dict, standard_info: Dict,
+                              document_type: str = "procedure"):
+        """
+        Generate a new compliance document, yielding text as it is produced
+        
+        Args:
+            clause_info: Dict with clause_number, title, description
+            standard_info: Dict with standard name, version
+            document_type: Type of document to generate (procedure, policy, record, etc.)
+        
+        Yields:
+            Chunks of generated document content
+        """
+        if not self.client:
+            raise ValueError("AI client not configured. Please configure AI settings first.")
+        
+        prompt = self._build_generation_prompt(clause_info, standard_info, document_type)
+        input_hash = self._cache_key(prompt, system_prompt=GENERATION_SYSTEM_PROMPT)
+        start = time.monotonic()
+        
+        cached = await asyncio.to_thread(self._cache_get, input_hash)
+        if cached is not None:
+            await _audit({"ai_call_log": [self._call_log_row("streaming", start, cache_hit=True)]})
+            yield cached
+            return
+        
+        parts = []
+        async for chunk in self._stream(prompt, get_timeout(self.provider, "streaming"),
+                                       system_prompt=GENERATION_SYSTEM_PROMPT):
+            parts.append(chunk)
+            yield chunk
+        
+        await self._audit_generation(input_hash, "streaming", start,
+                                     GENERATION_SYSTEM_PROMPT + prompt, "".join(parts))
     
     def _parse_improvement_response(self, response: str) -> Dict:
         """Parse AI improvement response"""
+        # JSON mode responses are the object itself; otherwise scan for the first
+        # balanced object that parses (prose may contain stray braces before it)
+        start = time.perf_counter()
         try:
-            # Try to extract JSON from response
-            if "```json" in response:
-                json_str = response.split("```json")[1].split("```")[0].strip()
-            elif "{" in response and "}" in response:
-                # Find the JSON object
-                start = response.find("{")
-                end = response.rfind("}") + 1
-                json_str = response[start:end]
-            else:
-                json_str = response
-            
-            return json.loads(json_str)
-        except:
-            # Fallback if JSON parsing fails
-            return {
-                "compliance_score": 0,
-                "gaps": ["Unable to parse AI response"],
-                "suggestions": [response],
-                "critical_issues": [],
-                "improved_sections": {}
-            }
+            parsed = orjson.loads(response)
+            if isinstance(parsed, dict):
+                return parsed
+        except ValueError:
+            pass
+        
+        for candidate in _iter_balanced(response, "{", "}"):
+            try:
+                return orjson.loads(candidate)
+            except ValueError:
+                continue
+        
+        # Fallback if JSON parsing fails
+        logger.warning("parse failed prov=%s dur=%.2f", self.provider, time.perf_counter() - start)
+        return {
+            "compliance_score": 0,
+            "gaps": ["Unable to parse AI response"],
+            "suggestions": [response],
+            "critical_issues": [],
+            "improved_sections": {}
+        }
     
-    def generate_compliance_recommendations(self, missing_documents: List[Dict], 
+    async def generate_compliance_recommendations(self, missing_documents: Union[List[Dict], str], 
                                            element_scores: Dict) -> List[Dict]:
         """
         Generate prioritized recommendations for improving compliance score
         
         Args:
-            missing_documents: List of missing document info
+            missing_documents: List of missing document info, or that list already
+                serialized as a JSON string
             element_scores: Dict of element scores
         
         Returns:
@@ -253,13 +1003,18 @@ Focus on:
         if not self.client:
             raise ValueError("AI client not configured")
         
+        if isinstance(missing_documents, str):
+            missing_json = missing_documents
+        else:
+            missing_json = orjson.dumps(missing_documents, option=orjson.OPT_INDENT_2).decode()
+        
         prompt = f"""As a compliance consultant, analyze this compliance situation and provide actionable recommendations:
 
 Missing Documents:
-{json.dumps(missing_documents, indent=2)}
+{missing_json}
 
 Element Scores:
-{json.dumps(element_scores, indent=2)}
+{orjson.dumps(element_scores, option=orjson.OPT_INDENT_2).decode()}
 
 Provide a prioritized list of 5-10 recommendations in JSON format:
 [
@@ -280,68 +1035,346 @@ Prioritize based on:
 3. Element weight
 4. Dependency on other requirements"""
         
-        if self.provider == "openai":
-            response = self._generate_openai(prompt)
-        elif self.provider == "google":
-            response = self._generate_google(prompt)
-        elif self.provider == "deepseek":
-            response = self._generate_deepseek(prompt)
+        response = await self._cached_generate(prompt, call_type="batch")
         
+        start = time.perf_counter()
         try:
             if "[" in response:
-                start = response.find("[")
-                end = response.rfind("]") + 1
-                return json.loads(response[start:end])
-        except:
-            pass
+                return orjson.loads(response[response.find("["):response.rfind("]") + 1])
+        except json.JSONDecodeError:
+            logger.warning("parse failed prov=%s dur=%.2f", self.provider, time.perf_counter() - start)
         
         return []
+    
+    # ==================== Bulk Generation ====================
+    
+    async def generate_many(self, prompts: List[str],
+                            concurrency: int = MAX_CONCURRENT_GENERATIONS) -> List[str]:
+        """
+        Generate responses for many prompts concurrently
+        
+        Args:
+            prompts: Prompts to send
+            concurrency: Maximum number of in-flight provider calls
+        
+        Returns:
+            Responses in the same order as prompts
+        """
+        if not self.client:
+            raise ValueError("AI client not configured")
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def generate_one(prompt: str) -> str:
+            async with semaphore:
+                return await self._cached_generate(prompt)
+        
+        return await asyncio.gather(*(generate_one(p) for p in prompts))
+    
+    async def submit_batch(self, prompts: List[str], custom_ids: Optional[List[str]] = None) -> str:
+        """
+        Submit prompts to the OpenAI Batch API for offline processing
+        
+        Args:
+            prompts: Prompts to send, one chat completion each
+            custom_ids: Keys for each prompt's result (defaults to prompt-0, prompt-1, ...)
+        
+        Returns:
+            The OpenAI batch id, also recorded in ai_batch_jobs
+        """
+        if self.provider != "openai" or not self.client:
+            raise ValueError("Batch jobs require an OpenAI configuration")
+        
+        lines = []
+        for i, prompt in enumerate(prompts):
+            lines.append(json.dumps({
+                "custom_id": custom_ids[i] if custom_ids else f"prompt-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model_name,
+                    "messages": self._chat_messages(prompt),
+                    "temperature": 0.7,
+                    "max_tokens": 3000
+                }
+            }))
+        
+        batch_file = await self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode()),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        await asyncio.to_thread(self._record_batch, batch.id, batch.status, len(prompts))
+        return batch.id
+    
+    def _record_batch(self, batch_id: str, status: str, prompt_count: int):
+        """Store a newly submitted batch job"""
+        with write_conn() as conn:
+            conn.execute(
+                """INSERT INTO ai_batch_jobs (batch_id, provider, model, status, prompt_count, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (batch_id, self.provider, self.model_name, status, prompt_count, int(time.time()))
+            )
+    
+    async def poll_batches(self):
+        """Check pending batch jobs and store results for any that have finished"""
+        if self.provider != "openai" or not self.client:
+            return
+        
+        rows = await asyncio.to_thread(
+            _fetch_all,
+            "SELECT batch_id FROM ai_batch_jobs WHERE status NOT IN ('completed', 'failed', 'expired', 'cancelled')",
+            ()
+        )
+        
+        for (batch_id,) in rows:
+            try:
+                await self._collect_batch(batch_id)
+            except Exception:
+                # One bad job must not block the others on every poll
+                logger.exception("Error collecting AI batch job %s", batch_id)
+    
+    async def _collect_batch(self, batch_id: str):
+        """Fetch one batch job and store its results and per-request errors once it has finished"""
+        batch = await self.client.batches.retrieve(batch_id)
+        status = batch.status
+        results = None
+        errors = None
+        
+        if status in ("completed", "failed", "expired", "cancelled"):
+            results = {}
+            errors = {}
+            if batch.output_file_id:
+                output = await self.client.files.content(batch.output_file_id)
+                self._parse_batch_output(output.text, results, errors)
+            if batch.error_file_id:
+                output = await self.client.files.content(batch.error_file_id)
+                self._parse_batch_output(output.text, results, errors)
+            if batch.errors and batch.errors.data:
+                # Batch-level failures (e.g. an invalid input file) have no custom_id
+                errors["batch"] = "; ".join(e.message or e.code or "" for e in batch.errors.data)
+            
+            if status == "completed" and not results:
+                status = "failed"
+            if errors:
+                logger.warning("AI batch %s finished %s with %d failed requests", batch_id, status, len(errors))
+        
+        await asyncio.to_thread(self._update_batch, batch_id, status, results, errors)
+    
+    @staticmethod
+    def _parse_batch_output(text: str, results: Dict, errors: Dict):
+        """Split Batch API output lines into completion text and error messages by custom_id"""
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = item.get("custom_id")
+            response = item.get("response") or {}
+            body = response.get("body") or {}
+            
+            if item.get("error"):
+                error = item["error"]
+                errors[custom_id] = error.get("message") if isinstance(error, dict) else str(error)
+            elif response.get("status_code") != 200 or not body.get("choices"):
+                error = body.get("error") or {}
+                errors[custom_id] = error.get("message") or f"HTTP {response.get('status_code')}"
+            else:
+                results[custom_id] = body["choices"][0]["message"]["content"]
+    
+    def _update_batch(self, batch_id: str, status: str, results: Optional[Dict], errors: Optional[Dict]):
+        """Record the latest status (and results and errors, once finished) of a batch job"""
+        with write_conn() as conn:
+            conn.execute(
+                """UPDATE ai_batch_jobs
+                   SET status = ?, results = ?, errors = ?, completed_at = ?
+                   WHERE batch_id = ?""",
+                (status,
+                 json.dumps(results) if results is not None else None,
+                 json.dumps(errors) if errors else None,
+                 int(time.time()) if results is not None else None,
+                 batch_id)
+            )
+
+
+# ==================== Shared Assistant ====================
+
+# ai_config rows held in memory; re-read on startup, SIGHUP, POST /api/ai/config/reload
+# and by POST /api/ai-config after it saves a new config
+CONFIG: Optional[Dict] = None
+_config_lock = threading.Lock()
+
+_assistant_singleton: Optional[AIDocumentAssistant] = None
+_config_version: Optional[int] = None
+_assistant_lock = threading.Lock()
+
+def reload_config() -> Dict:
+    """Re-read ai_config from SQLite and swap it in as CONFIG"""
+    global CONFIG
+    with read_conn() as conn:
+        rows = conn.execute(
+            "SELECT id, provider, api_key, model_name, is_active FROM ai_config ORDER BY id"
+        ).fetchall()
+    
+    # Saving a config always inserts a new row, so the active row id versions it
+    active = next((row for row in reversed(rows) if row[4]), None)
+    config = {
+        "version": active[0] if active else None,
+        "active": tuple(active[1:4]) if active else None,
+        # Latest saved row per provider, for racing
+        "providers": {row[1]: tuple(row[1:4]) for row in rows}
+    }
+    with _config_lock:
+        CONFIG = config
+    return config
+
+def get_config() -> Dict:
+    """Current AI configuration, loaded from SQLite on first use"""
+    config = CONFIG
+    if config is None:
+        config = reload_config()
+    return config
+
+def _load_racing_assistants(providers: Tuple[str, ...],
+                            max_cost_per_1k: Optional[float] = None) -> List[AIDocumentAssistant]:
+    """Build an assistant for each provider with a saved configuration"""
+    saved = get_config()["providers"]
+    
+    assistants = []
+    for provider in providers:
+        if provider not in saved:
+            continue
+        if max_cost_per_1k is not None and PROVIDER_COST_PER_1K.get(provider, float("inf")) > max_cost_per_1k:
+            continue
+        assistant = AIDocumentAssistant(*saved[provider])
+        if assistant.client:
+            assistants.append(assistant)
+    return assistants
+
+def get_assistant() -> AIDocumentAssistant:
+    """Return the shared assistant, rebuilding it only when the active config changes"""
+    global _assistant_singleton, _config_version
+    version = get_config()["version"]
+    with _assistant_lock:
+        if _assistant_singleton is None or version != _config_version:
+            _assistant_singleton = AIDocumentAssistant()
+            _config_version = version
+        return _assistant_singleton
+
+async def _poll_batches_forever():
+    """Background loop that collects finished batch jobs"""
+    while True:
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+        try:
+            assistant = get_assistant()
+            await assistant.poll_batches()
+        except Exception:
+            logger.exception("Error polling AI batch jobs")
 
 
 # FastAPI endpoint additions for the backend
 
+def _fetch_one(query: str, params: tuple):
+    """Run a single-row query on a pooled reader connection"""
+    with read_conn() as conn:
+        return conn.execute(query, params).fetchone()
+
+def _fetch_all(query: str, params: tuple) -> List:
+    """Run a multi-row query on a pooled reader connection"""
+    with read_conn() as conn:
+        return conn.execute(query, params).fetchall()
+
+def _load_clause_context(clause_id: int) -> Optional[Tuple[Dict, Dict]]:
+    """Fetch (clause_info, standard_info) for a clause, or None if it does not exist"""
+    row = _fetch_one("""
+        SELECT c.clause_number, c.title, c.description, c.standard_id,
+               s.name as standard_name, s.version as standard_version
+        FROM clauses c
+        JOIN standards s ON c.standard_id = s.id
+        WHERE c.id = ?
+    """, (clause_id,))
+    
+    if not row:
+        return None
+    
+    clause_info = {
+        "id": clause_id,
+        "clause_number": row[0],
+        "title": row[1],
+        "description": row[2]
+    }
+    
+    standard_info = {
+        "name": row[4],
+        "version": row[5]
+    }
+    
+    return clause_info, standard_info
+
+def _read_text_file(file_path: str) -> str:
+    """Read a UTF-8 text file"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
 def add_ai_endpoints(app):
     """Add AI-related endpoints to FastAPI app"""
+    from fastapi.responses import StreamingResponse
+    
+    @app.on_event("startup")
+    async def load_ai_config():
+        """Load AI configuration into memory and reload it on SIGHUP"""
+        await asyncio.to_thread(reload_config)
+        if hasattr(signal, "SIGHUP"):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_config)
+    
+    @app.on_event("startup")
+    async def start_batch_poller():
+        """Start collecting results of submitted batch jobs"""
+        app.state.batch_poller = asyncio.create_task(_poll_batches_forever())
+    
+    @app.on_event("shutdown")
+    async def close_ai_clients():
+        """Release pooled HTTP connections"""
+        app.state.batch_poller.cancel()
+        await close_async_client()
+    
+    @app.post("/api/ai/config/reload")
+    async def reload_config_endpoint():
+        """Re-read AI configuration from the database (call after saving a new config)"""
+        config = await asyncio.to_thread(reload_config)
+        active = config["active"]
+        return {
+            "success": True,
+            "provider": active[0] if active else None,
+            "model_name": active[2] if active else None
+        }
     
     @app.post("/api/ai/generate-document")
     async def generate_document_endpoint(
         clause_id: int,
-        document_type: str = "procedure"
+        document_type: str = "procedure",
+        race: bool = False
     ):
-        """Generate a new document for a clause using AI"""
-        assistant = AIDocumentAssistant()
+        """Generate a new document for a clause using AI (optionally racing providers)"""
+        assistant = get_assistant()
         
         # Get clause and standard info from database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT c.clause_number, c.title, c.description, c.standard_id,
-                   s.name as standard_name, s.version as standard_version
-            FROM clauses c
-            JOIN standards s ON c.standard_id = s.id
-            WHERE c.id = ?
-        """, (clause_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if not row:
+        context = await asyncio.to_thread(_load_clause_context, clause_id)
+        if not context:
             return {"error": "Clause not found"}
         
-        clause_info = {
-            "clause_number": row[0],
-            "title": row[1],
-            "description": row[2]
-        }
-        
-        standard_info = {
-            "name": row[4],
-            "version": row[5]
-        }
+        clause_info, standard_info = context
         
         try:
-            content = assistant.generate_document(clause_info, standard_info, document_type)
+            async with audit_scope():
+                if race:
+                    content = await assistant.generate_document_racing(clause_info, standard_info, document_type)
+                else:
+                    content = await assistant.generate_document(clause_info, standard_info, document_type)
             return {
                 "success": True,
                 "content": content,
@@ -350,40 +1383,59 @@ def add_ai_endpoints(app):
         except Exception as e:
             return {"error": str(e)}
     
+    @app.post("/api/ai/generate-document/stream")
+    async def stream_document_endpoint(
+        clause_id: int,
+        document_type: str = "procedure"
+    ):
+        """Generate a new document for a clause, streamed as server-sent events"""
+        assistant = get_assistant()
+        
+        context = await asyncio.to_thread(_load_clause_context, clause_id)
+        if not context:
+            return {"error": "Clause not found"}
+        
+        clause_info, standard_info = context
+        
+        async def events():
+            try:
+                async with audit_scope():
+                    async for chunk in assistant.stream_document(clause_info, standard_info, document_type):
+                        yield f"data: {orjson.dumps({'content': chunk}).decode()}\n\n"
+                yield "event: done\ndata: {}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        
+        return StreamingResponse(events(), media_type="text/event-stream")
+    
     @app.post("/api/ai/improve-document")
     async def improve_document_endpoint(
         document_id: int
     ):
         """Get AI suggestions for improving a document"""
-        assistant = AIDocumentAssistant()
+        assistant = get_assistant()
         
         # Get document content and associated clause info
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        row = await asyncio.to_thread(_fetch_one, """
             SELECT d.file_path, c.clause_number, c.title, c.description,
-                   s.name as standard_name, s.version as standard_version
+                   s.name as standard_name, s.version as standard_version, c.id
             FROM documents d
             JOIN clauses c ON d.clause_id = c.id
             JOIN standards s ON c.standard_id = s.id
             WHERE d.id = ?
         """, (document_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {"error": "Document not found"}
         
         # Read document content (simplified - would need proper text extraction)
         try:
-            with open(row[0], 'r', encoding='utf-8') as f:
-                content = f.read()
-        except:
+            content = await asyncio.to_thread(_read_text_file, row[0])
+        except (OSError, UnicodeDecodeError):
             return {"error": "Could not read document content"}
         
         clause_info = {
+            "id": row[6],
             "clause_number": row[1],
             "title": row[2],
             "description": row[3]
@@ -395,7 +1447,8 @@ def add_ai_endpoints(app):
         }
         
         try:
-            improvements = assistant.improve_document(content, clause_info, standard_info)
+            async with audit_scope():
+                improvements = await assistant.improve_document(content, clause_info, standard_info)
             return {
                 "success": True,
                 "improvements": improvements
@@ -406,35 +1459,83 @@ def add_ai_endpoints(app):
     @app.get("/api/ai/recommendations/{standard_id}")
     async def get_recommendations(standard_id: int):
         """Get AI-powered recommendations for improving compliance"""
-        assistant = AIDocumentAssistant()
+        assistant = get_assistant()
         
         # Get compliance data
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT c.clause_number, c.title, c.weight
+        # SQLite builds the JSON array directly; it goes into the prompt as-is
+        row = await asyncio.to_thread(_fetch_one, """
+            SELECT json_group_array(json_object(
+                'clause_number', c.clause_number, 'title', c.title, 'weight', c.weight
+            ))
             FROM clauses c
             LEFT JOIN documents d ON c.id = d.clause_id AND d.status = 'active'
             WHERE c.standard_id = ? AND d.id IS NULL
         """, (standard_id,))
         
-        missing = [{"clause_number": r[0], "title": r[1], "weight": r[2]} 
-                  for r in cursor.fetchall()]
+        missing = row[0]
         
         # Get element scores (simplified)
         element_scores = {}  # Would calculate this properly
         
-        conn.close()
-        
         try:
-            recommendations = assistant.generate_compliance_recommendations(missing, element_scores)
+            async with audit_scope():
+                recommendations = await assistant.generate_compliance_recommendations(missing, element_scores)
             return {
                 "success": True,
                 "recommendations": recommendations
             }
         except Exception as e:
             return {"error": str(e)}
+    
+    @app.post("/api/ai/batches")
+    async def submit_batch_endpoint(clause_ids: List[int], document_type: str = "procedure"):
+        """Queue document generation for several clauses as one offline batch job"""
+        assistant = get_assistant()
+        
+        prompts = []
+        custom_ids = []
+        for clause_id in clause_ids:
+            context = await asyncio.to_thread(_load_clause_context, clause_id)
+            if not context:
+                return {"error": f"Clause {clause_id} not found"}
+            clause_info, standard_info = context
+            prompts.append(assistant._build_generation_prompt(clause_info, standard_info, document_type))
+            custom_ids.append(f"clause-{clause_id}")
+        
+        if not prompts:
+            return {"error": "No clauses given"}
+        
+        try:
+            batch_id = await assistant.submit_batch(prompts, custom_ids)
+            return {
+                "success": True,
+                "batch_id": batch_id,
+                "prompt_count": len(prompts)
+            }
+        except Exception as e:
+            return {"error": str(e)}
+    
+    @app.get("/api/ai/batches/{batch_id}")
+    async def get_batch_job(batch_id: str):
+        """Get the status and, once complete, the results of an AI batch job"""
+        row = await asyncio.to_thread(
+            _fetch_one,
+            "SELECT status, prompt_count, results, errors, created_at, completed_at FROM ai_batch_jobs WHERE batch_id = ?",
+            (batch_id,)
+        )
+        
+        if not row:
+            return {"error": "Batch job not found"}
+        
+        return {
+            "batch_id": batch_id,
+            "status": row[0],
+            "prompt_count": row[1],
+            "results": json.loads(row[2]) if row[2] else None,
+            "errors": json.loads(row[3]) if row[3] else None,
+            "created_at": row[4],
+            "completed_at": row[5]
+        }
 
 # Example usage
 if __name__ == "__main__":
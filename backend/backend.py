@@ -12,13 +12,17 @@ from datetime import datetime
 import sqlite3
 import json
 import os
+import sys
 import hashlib
-import shutil
+import ssl
 from pathlib import Path
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
 from enhanced_scanner import EnhancedDocumentScanner
+import db
 
 # Initialize FastAPI app
 app = FastAPI(title="Compliance Document Manager")
@@ -32,16 +36,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configuration
-DB_PATH = "compliance.db"
+# Configuration (the database path and connection pool live in db.py)
 DOCUMENT_STORAGE = Path("./document_storage")
 DOCUMENT_STORAGE.mkdir(exist_ok=True)
+# Hashing read size: large enough to amortise syscalls and let hashlib release the GIL
+HASH_CHUNK_SIZE = 1 << 20
+# Monitored folders on network filesystems get a PollingObserver checking every poll_interval
+# seconds (monitored_folders.poll_interval); native change notifications are unreliable there
+NETWORK_FILESYSTEMS = {'cifs', 'smbfs', 'smb3', 'nfs', 'nfs4', 'fuse.sshfs', '9p'}
+DEFAULT_POLL_INTERVAL = 60
 
 # ==================== Database Setup ====================
 
 def init_database():
     """Initialize SQLite database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect()
     cursor = conn.cursor()
     
     # Standards table
@@ -78,6 +87,7 @@ def init_database():
             file_name TEXT NOT NULL,
             file_path TEXT NOT NULL,
             file_hash TEXT,
+            scan_hash TEXT,
             document_type TEXT,
             status TEXT DEFAULT 'active',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -94,6 +104,7 @@ def init_database():
             revision_number INTEGER NOT NULL,
             file_path TEXT NOT NULL,
             file_hash TEXT NOT NULL,
+            scan_hash TEXT,
             notes TEXT,
             created_by TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -150,11 +161,125 @@ def init_database():
             folder_path TEXT NOT NULL UNIQUE,
             is_active BOOLEAN DEFAULT 1,
             last_scan TIMESTAMP,
+            poll_interval INTEGER DEFAULT 60,
             FOREIGN KEY (standard_id) REFERENCES standards(id)
         )
     """)
     
-    conn.commit()
+    # Scan hashes keyed by path, reused while a file's size and mtime are unchanged
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS hash_cache (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            scan_hash TEXT NOT NULL
+        )
+    """)
+    
+    # Extracted document keywords keyed by path, reused while a file's size and mtime are unchanged
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS keyword_cache (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            keywords TEXT NOT NULL
+        )
+    """)
+    
+    # LLM response cache (keyed on a hash of provider, model, prompt and prompt version)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            input_hash TEXT PRIMARY KEY,
+            provider TEXT,
+            model TEXT,
+            prompt_version TEXT,
+            response TEXT,
+            created_at INTEGER,
+            expires_at INTEGER
+        )
+    """)
+    
+    # Clause-scoped document embeddings for the semantic improvement cache,
+    # keyed like llm_cache on provider, model and prompt version and expiring the same way
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS doc_embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_hash TEXT NOT NULL,
+            clause_id TEXT NOT NULL,
+            provider TEXT,
+            model TEXT,
+            prompt_version TEXT,
+            embedding BLOB NOT NULL,
+            response TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at INTEGER
+        )
+    """)
+    
+    # Offline AI batch jobs (OpenAI Batch API)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ai_batch_jobs (
+            batch_id TEXT PRIMARY KEY,
+            provider TEXT NOT NULL,
+            model TEXT,
+            status TEXT NOT NULL,
+            prompt_count INTEGER DEFAULT 0,
+            results TEXT,
+            errors TEXT,
+            created_at INTEGER,
+            completed_at INTEGER
+        )
+    """)
+    
+    # Per-call AI telemetry, written in one batch per request
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ai_call_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            provider TEXT NOT NULL,
+            model TEXT,
+            call_type TEXT,
+            duration_ms REAL,
+            cache_hit INTEGER DEFAULT 0,
+            created_at INTEGER
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ai_token_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            provider TEXT NOT NULL,
+            model TEXT,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            created_at INTEGER
+        )
+    """)
+    
+    # Indexes for per-clause document listings, the missing-documents LEFT JOIN
+    # (recommendations and scoring) and ordered clause/revision lookups.
+    # Planner statistics for them are refreshed by migrate_db, not on every startup.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_docs_clause_status_created
+        ON documents(clause_id, status, created_at DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_revisions_doc
+        ON document_revisions(document_id, revision_number DESC)
+    """)
+    # Unique as well: a standard lists each clause number once. A database that already
+    # holds duplicates keeps a plain index until migrate_db can upgrade it.
+    try:
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_clauses_standard_number
+            ON clauses(standard_id, clause_number)
+        """)
+    except sqlite3.IntegrityError:
+        print("Warning: duplicate clause numbers found; clause numbers are not enforced unique")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_clauses_standard_number
+            ON clauses(standard_id, clause_number)
+        """)
+    
     conn.close()
 
 # ==================== Pydantic Models ====================
@@ -199,43 +324,98 @@ class ReassignRequest(BaseModel):
 
 # ==================== Helper Functions ====================
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 def calculate_file_hash(file_path: str) -> str:
     """Calculate SHA-256 hash of a file"""
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
+    with open(file_path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        # Python < 3.11
+        sha256_hash = hashlib.sha256()
+        for byte_block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
             sha256_hash.update(byte_block)
+        return sha256_hash.hexdigest()
+
+def save_and_hash_upload(source, file_path: Path) -> str:
+    """Write an uploaded file to disk, hashing each chunk as it is written (returns SHA-256)"""
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "wb") as buffer:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            buffer.write(chunk)
+            sha256_hash.update(chunk)
     return sha256_hash.hexdigest()
 
+def get_filesystem_type(folder_path: str) -> Optional[str]:
+    """Filesystem type of the mount holding folder_path (Linux /proc/mounts), if known"""
+    path = os.path.realpath(folder_path)
+    best_mount, best_type = "", None
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) \
+                        and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, fields[2]
+    except OSError:
+        return None
+    return best_type
+
+def create_folder_observer(folder_path: str, poll_interval: int = DEFAULT_POLL_INTERVAL):
+    """Pick a watchdog observer for a folder: polling on network shares, native otherwise"""
+    if get_filesystem_type(folder_path) in NETWORK_FILESYSTEMS:
+        return PollingObserver(timeout=poll_interval)
+    return Observer()
+
+def report_hash_backend():
+    """Print the OpenSSL build behind hashlib and whether the CPU advertises SHA extensions"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu_info = f.read()
+    except OSError:
+        cpu_info = ""
+    # x86 lists sha_ni, ARMv8 lists sha2; OpenSSL picks them up at runtime when present
+    has_sha_ext = " sha_ni" in cpu_info or " sha2" in cpu_info
+    print(f"File hashing via {ssl.OPENSSL_VERSION}; CPU SHA extensions: "
+          f"{'available' if has_sha_ext else 'not detected'}")
+
+FILE_TYPE_MAP = {
+    '.pdf': 'PDF',
+    '.doc': 'Word',
+    '.docx': 'Word',
+    '.xls': 'Excel',
+    '.xlsx': 'Excel',
+    '.ppt': 'PowerPoint',
+    '.pptx': 'PowerPoint',
+    '.jpg': 'Image',
+    '.jpeg': 'Image',
+    '.png': 'Image'
+}
+
 def get_file_type(file_path: str) -> str:
     """Determine document type from extension"""
-    ext = Path(file_path).suffix.lower()
-    type_map = {
-        '.pdf': 'PDF',
-        '.doc': 'Word',
-        '.docx': 'Word',
-        '.xls': 'Excel',
-        '.xlsx': 'Excel',
-        '.ppt': 'PowerPoint',
-        '.pptx': 'PowerPoint',
-        '.jpg': 'Image',
-        '.jpeg': 'Image',
-        '.png': 'Image'
-    }
-    return type_map.get(ext, 'Unknown')
+    # Slice the suffix directly; this runs once per scanned file and Path() is comparatively slow
+    dot = file_path.rfind('.')
+    if dot == -1:
+        return 'Unknown'
+    return FILE_TYPE_MAP.get(file_path[dot:].lower(), 'Unknown')
 
 # ==================== API Endpoints ====================
+# Endpoints that only query SQLite are plain def: FastAPI runs them in its threadpool,
+# so a query waiting on the single writer never blocks the event loop
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
+    """Initialize database and start watching monitored folders on startup"""
     init_database()
+    report_hash_backend()
+    await start_folder_monitors()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop watching monitored folders"""
+    await asyncio.to_thread(stop_folder_monitors)
 
 @app.get("/")
 async def root():
@@ -244,82 +424,84 @@ async def root():
 
 # Standards endpoints
 @app.post("/api/standards")
-async def create_standard(standard: StandardCreate):
+def create_standard(standard: StandardCreate):
     """Create a new compliance standard"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute(
-            "INSERT INTO standards (name, version, description) VALUES (?, ?, ?)",
-            (standard.name, standard.version, standard.description)
-        )
-        conn.commit()
-        standard_id = cursor.lastrowid
+        with db.write_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO standards (name, version, description) VALUES (?, ?, ?)",
+                (standard.name, standard.version, standard.description)
+            )
+            standard_id = cursor.lastrowid
         return {"id": standard_id, "message": "Standard created successfully"}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Standard already exists")
-    finally:
-        conn.close()
 
 @app.get("/api/standards")
-async def get_standards():
+def get_standards():
     """Get all compliance standards"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM standards ORDER BY name")
-    standards = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    with db.read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = db.dict_factory
+        cursor.execute("SELECT * FROM standards ORDER BY name")
+        standards = cursor.fetchall()
     return standards
 
 @app.get("/api/standards/{standard_id}")
-async def get_standard(standard_id: int):
+def get_standard(standard_id: int):
     """Get a specific standard with its clauses"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM standards WHERE id = ?", (standard_id,))
-    standard = cursor.fetchone()
-    
-    if not standard:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Standard not found")
-    
-    cursor.execute("SELECT * FROM clauses WHERE standard_id = ? ORDER BY clause_number", (standard_id,))
-    clauses = [dict(row) for row in cursor.fetchall()]
+    with db.read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = db.dict_factory
+        
+        cursor.execute("SELECT * FROM standards WHERE id = ?", (standard_id,))
+        standard = cursor.fetchone()
+        
+        if not standard:
+            raise HTTPException(status_code=404, detail="Standard not found")
+        
+        cursor.execute("SELECT * FROM clauses WHERE standard_id = ? ORDER BY clause_number", (standard_id,))
+        clauses = cursor.fetchall()
     
-    conn.close()
-    return {"standard": dict(standard), "clauses": clauses}
+    return {"standard": standard, "clauses": clauses}
 
 # Clause endpoints
 @app.post("/api/clauses")
-async def create_clause(clause: ClauseCreate):
+def create_clause(clause: ClauseCreate):
     """Create a new clause/requirement"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """INSERT INTO clauses (standard_id, clause_number, title, description, weight, parent_clause_id)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (clause.standard_id, clause.clause_number, clause.title, clause.description, clause.weight, clause.parent_clause_id)
-    )
-    conn.commit()
-    clause_id = cursor.lastrowid
-    conn.close()
-    return {"id": clause_id, "message": "Clause created successfully"}
+    try:
+        with db.write_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO clauses (standard_id, clause_number, title, description, weight, parent_clause_id)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (clause.standard_id, clause.clause_number, clause.title, clause.description, clause.weight, clause.parent_clause_id)
+            )
+            clause_id = cursor.lastrowid
+        return {"id": clause_id, "message": "Clause created successfully"}
+    except sqlite3.IntegrityError as e:
+        # foreign_keys=ON, so a bad standard_id or parent_clause_id lands here too
+        if "UNIQUE" in str(e):
+            raise HTTPException(status_code=409, detail="Clause number already exists for this standard")
+        if "FOREIGN KEY" in str(e):
+            raise HTTPException(status_code=400, detail="Standard or parent clause does not exist")
+        raise
 
 @app.get("/api/clauses/{clause_id}/documents")
-async def get_clause_documents(clause_id: int):
+def get_clause_documents(clause_id: int):
     """Get all documents for a specific clause"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT d.*, 
-               (SELECT COUNT(*) FROM document_revisions WHERE document_id = d.id) as revision_count
-        FROM documents d
-        WHERE d.clause_id = ? AND d.status = 'active'
-        ORDER BY d.created_at DESC
-    """, (clause_id,))
-    documents = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    with db.read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = db.dict_factory
+        cursor.execute("""
+            SELECT d.*, 
+                   (SELECT COUNT(*) FROM document_revisions WHERE document_id = d.id) as revision_count
+            FROM documents d
+            WHERE d.clause_id = ? AND d.status = 'active'
+            ORDER BY d.created_at DESC
+        """, (clause_id,))
+        documents = cursor.fetchall()
     return documents
 
 # Document scanning
@@ -334,179 +516,418 @@ async def scan_folder(scan_request: FolderScanRequest, background_tasks: Backgro
     
     return {"message": "Scan started", "folder": scan_request.folder_path}
 
+# perform_scan statements, defined once so every call reuses SQLite's cached prepared statement
+# Existing documents for a standard with their hashes, newest id first
+# so the lowest id wins for duplicate (file_name, clause_id) rows
+SCAN_EXISTING_DOCUMENTS_SQL = """SELECT d.id, d.file_name, d.clause_id, d.file_hash, d.scan_hash
+    FROM documents d
+    JOIN clauses c ON d.clause_id = c.id
+    WHERE c.standard_id = ?
+    ORDER BY d.id DESC"""
+# file_hash keeps the scanner's MD5 content hash; scan_hash holds the fast xxh3 change hash.
+# The scan reads documents before it hashes and writes later, so the inserts re-check inside
+# each write transaction: a document another writer added meanwhile is not duplicated, and a
+# revision takes the next number at write time and is skipped if its document was deleted.
+SCAN_INSERT_DOCUMENT_SQL = """INSERT INTO documents 
+    (clause_id, file_name, file_path, file_hash, scan_hash, document_type, 
+     status, created_at, last_scanned, match_confidence, match_reason)
+    SELECT ?1, ?2, ?3, ?4, ?5, ?6, 'active', ?7, ?8, ?9, ?10
+    WHERE NOT EXISTS (SELECT 1 FROM documents WHERE clause_id = ?1 AND file_name = ?2)"""
+SCAN_INSERT_REVISION_SQL = """INSERT INTO document_revisions 
+    (document_id, revision_number, file_path, file_hash, scan_hash, notes, created_at)
+    SELECT ?1,
+           (SELECT COALESCE(MAX(revision_number), 0) + 1 FROM document_revisions WHERE document_id = ?1),
+           ?2, ?3, ?4, ?5, ?6
+    WHERE EXISTS (SELECT 1 FROM documents WHERE id = ?1)"""
+SCAN_UPDATE_DOCUMENT_SQL = """UPDATE documents
+    SET file_hash = ?, scan_hash = ?, file_path = ?, last_scanned = ?,
+        match_confidence = ?, match_reason = ?
+    WHERE id = ?"""
+SCAN_TOUCH_DOCUMENT_SQL = "UPDATE documents SET last_scanned = ?, scan_hash = ? WHERE id = ?"
+HASH_CACHE_LOOKUP_SQL = """SELECT path, size, mtime_ns, scan_hash FROM hash_cache
+    WHERE path IN (SELECT value FROM json_each(?))"""
+HASH_CACHE_STORE_SQL = "INSERT OR REPLACE INTO hash_cache (path, size, mtime_ns, scan_hash) VALUES (?, ?, ?, ?)"
+# Cached keywords for every path under a folder, as a primary-key range scan
+KEYWORD_CACHE_LOOKUP_SQL = """SELECT path, size, mtime_ns, keywords FROM keyword_cache
+    WHERE path >= ? AND path < ?"""
+KEYWORD_CACHE_STORE_SQL = "INSERT OR REPLACE INTO keyword_cache (path, size, mtime_ns, keywords) VALUES (?, ?, ?, ?)"
+# Buffered scan rows are written and committed once this many have accumulated, so a failed
+# scan keeps earlier batches and each WAL commit stays small enough to checkpoint
+SCAN_BATCH_ROWS = 1000
+
 async def perform_scan(standard_id: int, folder_path: str):
     """Perform the actual folder scan with enhanced matching"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create scan history entry
-    cursor.execute(
-        "INSERT INTO scan_history (standard_id, folder_path, started_at) VALUES (?, ?, ?)",
-        (standard_id, folder_path, datetime.now())
-    )
-    scan_id = cursor.lastrowid
-    conn.commit()
-    
-    start_time = datetime.now()
-    
-    # Get all clauses for this standard
-    cursor.execute("SELECT id, clause_number, title, description FROM clauses WHERE standard_id = ?", (standard_id,))
-    clauses = [dict(row) for row in cursor.fetchall()]
-    
-    # Initialize enhanced scanner
-    scanner = EnhancedDocumentScanner()
-    
-    # Scan folder with enhanced matching
-    scan_results = scanner.scan_folder(
-        folder_path=folder_path,
-        clauses=clauses,
-        match_threshold=0.3,
-        max_matches_per_doc=1  # Only best match per document
-    )
-    
-    # Process matches and update database
-    documents_added = 0
-    documents_updated = 0
-    
-    for match in scan_results['matches']:
-        file_path = match['file_path']
-        file_name = match['file_name']
-        file_hash = scanner.calculate_file_hash(file_path)
-        file_ext = Path(file_path).suffix.lower()
+    # Own autocommit connection (isolation_level=None) so each write batch below is an explicit
+    # transaction and the pooled writer is not held while the folder is scanned.
+    # Every query runs on a worker thread, so a busy writer never stalls the event loop.
+    conn = await asyncio.to_thread(db.connect)
+    try:
+        cursor = conn.cursor()
+        cursor.row_factory = db.dict_factory
         
-        # Get best match (first one, already sorted by score)
-        if match['clause_matches']:
-            best_clause_id, best_score, match_reason = match['clause_matches'][0]
-            
-            # Check if document already exists
+        # One local timestamp stamps the scan start and every document touched by this scan.
+        # It is passed explicitly: the CURRENT_TIMESTAMP column defaults are UTC, while
+        # completed_at and last_scanned are local time.
+        start_time = datetime.now()
+        
+        def start_scan():
+            """Record the scan and read its clauses and the folder's cached keywords"""
             cursor.execute(
-                "SELECT id, file_hash FROM documents WHERE file_name = ? AND clause_id = ?",
-                (file_name, best_clause_id)
+                "INSERT INTO scan_history (standard_id, folder_path, started_at) VALUES (?, ?, ?)",
+                (standard_id, folder_path, start_time)
             )
-            existing_doc = cursor.fetchone()
+            scan_id = cursor.lastrowid
             
-            if existing_doc:
-                # Check if file has changed
-                if existing_doc['file_hash'] != file_hash:
-                    # Create new revision
-                    cursor.execute(
-                        "SELECT MAX(revision_number) as max_rev FROM document_revisions WHERE document_id = ?",
-                        (existing_doc['id'],)
-                    )
-                    max_rev = cursor.fetchone()['max_rev'] or 0
-                    
-                    cursor.execute(
-                        """INSERT INTO document_revisions 
-                           (document_id, revision_number, file_path, file_hash, notes, created_at)
-                           VALUES (?, ?, ?, ?, ?, ?)""",
-                        (existing_doc['id'], max_rev + 1, file_path, file_hash,
-                         f"Auto-updated by scan. Match score: {best_score:.2f}", datetime.now())
-                    )
+            cursor.execute("SELECT id, clause_number, title, description FROM clauses WHERE standard_id = ?", (standard_id,))
+            clauses = cursor.fetchall()
+            
+            # Keywords extracted by earlier scans of this folder, so unchanged files are not parsed again
+            prefix = os.path.join(folder_path, '')
+            cursor.execute(KEYWORD_CACHE_LOOKUP_SQL, (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+            keyword_cache = {
+                row['path']: (row['size'], row['mtime_ns'], json.loads(row['keywords']))
+                for row in cursor.fetchall()
+            }
+            return scan_id, clauses, keyword_cache
+        
+        scan_id, clauses, keyword_cache = await asyncio.to_thread(start_scan)
+        
+        # Initialize enhanced scanner
+        scanner = EnhancedDocumentScanner()
+        
+        # Scan folder with enhanced matching (off the event loop; extraction is blocking)
+        scan_results = await asyncio.to_thread(
+            scanner.scan_folder,
+            folder_path=folder_path,
+            clauses=clauses,
+            match_threshold=0.3,
+            max_matches_per_doc=1,  # Only best match per document
+            keyword_cache=keyword_cache
+        )
+        
+        # Process matches as a pipeline: a thread pool hashes files (hashing releases the GIL)
+        # while this coroutine consumes the hashes in scan order and buffers rows per statement,
+        # writing them with executemany and committing every SCAN_BATCH_ROWS rows.
+        # Documents touched earlier in this scan are tracked in memory so repeats stay consistent.
+        matched = [m for m in scan_results['matches'] if m['clause_matches']]
+        documents_added = 0
+        documents_updated = 0
+        new_docs = []
+        new_revisions = []
+        changed_docs = []
+        unchanged_docs = []
+        cache_updates = []
+        keyword_updates = [
+            (path, size, mtime_ns, json.dumps(keywords))
+            for path, size, mtime_ns, keywords in scan_results['keyword_updates']
+        ]
+        
+        def flush_rows():
+            """Write buffered rows, one executemany per statement, as one BEGIN IMMEDIATE batch"""
+            # Taking the write lock up front: a deferred read upgraded to a write fails at once
+            # with "database is locked" if another connection committed since it began
+            with db.transaction(conn):
+                cursor.executemany(SCAN_INSERT_DOCUMENT_SQL, new_docs)
+                cursor.executemany(SCAN_INSERT_REVISION_SQL, new_revisions)
+                cursor.executemany(SCAN_UPDATE_DOCUMENT_SQL, changed_docs)
+                cursor.executemany(SCAN_TOUCH_DOCUMENT_SQL, unchanged_docs)
+                cursor.executemany(HASH_CACHE_STORE_SQL, cache_updates)
+                cursor.executemany(KEYWORD_CACHE_STORE_SQL, keyword_updates)
+            for rows in (new_docs, new_revisions, changed_docs, unchanged_docs, cache_updates, keyword_updates):
+                rows.clear()
+        
+        def load_known_files():
+            """Hash cache rows for the matched files and the standard's stored documents"""
+            # Files whose size and mtime match the hash cache are not read at all
+            cursor.execute(HASH_CACHE_LOOKUP_SQL, (json.dumps([m['file_path'] for m in matched]),))
+            hash_cache = {row['path']: row for row in cursor.fetchall()}
+            
+            # Every candidate clause belongs to this standard, so one query covers all lookups:
+            # (file_name, clause_id) -> [id, file_hash, scan_hash]. Read in autocommit mode, so no
+            # snapshot is held while files are hashed; flush_rows re-checks what it writes.
+            cursor.execute(SCAN_EXISTING_DOCUMENTS_SQL, (standard_id,))
+            known_docs = {
+                (row['file_name'], row['clause_id']): [row['id'], row['file_hash'], row['scan_hash']]
+                for row in cursor.fetchall()
+            }
+            return hash_cache, known_docs
+        
+        hash_cache, known_docs = await asyncio.to_thread(load_known_files)
+        
+        def hash_file(match, is_new):
+            """Scan hash for a matched file, a hash_cache row when it had to be computed,
+            and for a new document the MD5 file_hash it is stored with"""
+            # size and mtime_ns were captured by the scanner's directory walk
+            file_path, size, mtime_ns = match['file_path'], match['size'], match['mtime_ns']
+            file_hash = scanner.calculate_file_hash(file_path) if is_new else None
+            cached = hash_cache.get(file_path)
+            if cached and cached['size'] == size and cached['mtime_ns'] == mtime_ns:
+                return cached['scan_hash'], None, file_hash
+            scan_hash = scanner.calculate_scan_hash(file_path)
+            return scan_hash, (file_path, size, mtime_ns, scan_hash), file_hash
+        
+        loop = asyncio.get_running_loop()
+        
+        # A (file_name, clause) with no stored document is inserted once, for the last
+        # matching file, so earlier duplicates need not be hashed
+        keys = [(m['file_name'], m['clause_matches'][0][0]) for m in matched]
+        last_new = {key: i for i, key in enumerate(keys) if key not in known_docs}
+        work = [(m, key) for i, (m, key) in enumerate(zip(matched, keys))
+                if key in known_docs or last_new[key] == i]
+        
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            pending = [
+                loop.run_in_executor(executor, hash_file, m, key not in known_docs) for m, key in work
+            ]
+            
+            for (match, key), hashed in zip(work, pending):
+                scan_hash, cache_row, file_hash = await hashed
+                if cache_row:
+                    cache_updates.append(cache_row)
+                file_path = match['file_path']
+                
+                # Get best match (first one, already sorted by score)
+                best_clause_id, best_score, match_reason = match['clause_matches'][0]
+                
+                existing_doc = known_docs.get(key)
+                if existing_doc:
+                    doc_id, stored_hash, stored_scan_hash = existing_doc
+                    # Check if file has changed; documents recorded before scan hashes existed
+                    # are compared once against their MD5 file_hash
+                    if stored_scan_hash is None:
+                        file_hash = await loop.run_in_executor(
+                            executor, scanner.calculate_file_hash, file_path
+                        )
+                        changed = stored_hash != file_hash
+                    else:
+                        changed = stored_scan_hash != scan_hash
                     
-                    # Update main document record
-                    cursor.execute(
-                        """UPDATE documents
-                           SET file_hash = ?, file_path = ?, last_scanned = ?,
-                               match_confidence = ?, match_reason = ?
-                           WHERE id = ?""",
-                        (file_hash, file_path, datetime.now(), best_score, match_reason, existing_doc['id'])
-                    )
-                    documents_updated += 1
+                    if changed:
+                        # Only changed files need their MD5 file_hash
+                        if file_hash is None:
+                            file_hash = await loop.run_in_executor(
+                                executor, scanner.calculate_file_hash, file_path
+                            )
+                        # Create new revision and update main document record
+                        new_revisions.append(
+                            (doc_id, file_path, file_hash, scan_hash,
+                             f"Auto-updated by scan. Match score: {best_score:.2f}", start_time)
+                        )
+                        changed_docs.append(
+                            (file_hash, scan_hash, file_path, start_time, best_score, match_reason, doc_id)
+                        )
+                        existing_doc[1:] = [file_hash, scan_hash]
+                        documents_updated += 1
+                    else:
+                        # File unchanged, just update last_scanned (and record its scan hash)
+                        unchanged_docs.append((start_time, scan_hash, doc_id))
+                        existing_doc[2] = scan_hash
                 else:
-                    # File unchanged, just update last_scanned
-                    cursor.execute(
-                        "UPDATE documents SET last_scanned = ? WHERE id = ?",
-                        (datetime.now(), existing_doc['id'])
-                    )
-            else:
-                # New document - insert it
-                doc_type = get_file_type(file_path)
+                    # New document - insert it
+                    doc_type = get_file_type(match['file_name'])
+                    new_docs.append((best_clause_id, match['file_name'], file_path, file_hash, scan_hash,
+                                     doc_type, start_time, start_time, best_score, match_reason))
+                    documents_added += 1
+                
+                if (len(new_docs) + len(new_revisions) + len(unchanged_docs)) >= SCAN_BATCH_ROWS:
+                    await asyncio.to_thread(flush_rows)
+        
+        await asyncio.to_thread(flush_rows)
+        
+        def finish_scan():
+            """Update scan history and monitored folders together; returns the folder's settings"""
+            completed_at = datetime.now()
+            scan_duration = (completed_at - start_time).total_seconds()
+            with db.transaction(conn):
                 cursor.execute(
-                    """INSERT INTO documents 
-                       (clause_id, file_name, file_path, file_hash, document_type, 
-                        status, created_at, last_scanned, match_confidence, match_reason)
-                       VALUES (?, ?, ?, ?, ?, 'active', ?, ?, ?, ?)""",
-                    (best_clause_id, file_name, file_path, file_hash, doc_type,
-                     datetime.now(), datetime.now(), best_score, match_reason)
+                    """UPDATE scan_history
+                       SET documents_found = ?, documents_matched = ?, documents_added = ?,
+                           documents_updated = ?, scan_duration = ?, completed_at = ?
+                       WHERE id = ?""",
+                    (scan_results['documents_scanned'], scan_results['documents_matched'],
+                     documents_added, documents_updated, scan_duration, completed_at, scan_id)
                 )
-                documents_added += 1
-    
-    # Update scan history
-    scan_duration = (datetime.now() - start_time).total_seconds()
-    cursor.execute(
-        """UPDATE scan_history
-           SET documents_found = ?, documents_matched = ?, documents_added = ?,
-               documents_updated = ?, scan_duration = ?, completed_at = ?
-           WHERE id = ?""",
-        (scan_results['documents_scanned'], scan_results['documents_matched'],
-         documents_added, documents_updated, scan_duration, datetime.now(), scan_id)
-    )
-    
-    # Update monitored folders
-    cursor.execute(
-        """INSERT OR REPLACE INTO monitored_folders (standard_id, folder_path, last_scan)
-           VALUES (?, ?, ?)""",
-        (standard_id, folder_path, datetime.now())
-    )
+                # Upsert rather than REPLACE, which would reset the folder's poll_interval and is_active
+                cursor.execute(
+                    """INSERT INTO monitored_folders (standard_id, folder_path, last_scan)
+                       VALUES (?, ?, ?)
+                       ON CONFLICT(folder_path) DO UPDATE
+                       SET standard_id = excluded.standard_id, last_scan = excluded.last_scan""",
+                    (standard_id, folder_path, completed_at)
+                )
+                cursor.execute(
+                    "SELECT is_active, poll_interval FROM monitored_folders WHERE folder_path = ?",
+                    (folder_path,)
+                )
+                return cursor.fetchone()
+        
+        folder = await asyncio.to_thread(finish_scan)
+    finally:
+        conn.close()
     
-    conn.commit()
-    conn.close()
+    # Keep the folder under watch so later changes are picked up without a manual scan
+    if folder['is_active']:
+        await asyncio.to_thread(
+            watch_folder, asyncio.get_running_loop(), standard_id, folder_path,
+            folder['poll_interval'] or DEFAULT_POLL_INTERVAL
+        )
+
+# ==================== Folder Monitoring ====================
 
+# Quiet period after the last file event before a monitored folder is rescanned,
+# so a burst of copies or saves triggers one scan
+RESCAN_DEBOUNCE_SECONDS = 5.0
+
+# Running observers and their handlers, keyed on folder path
+folder_observers: Dict[str, tuple] = {}
+
+class FolderChangeHandler(FileSystemEventHandler):
+    """Rescans a monitored folder once file events under it have settled"""
     
-# Compliance scoring
-@app.get("/api/compliance-score/{standard_id}")
-async def get_compliance_score(standard_id: int) -> ComplianceScore:
-    """Calculate compliance score for a standard"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    def __init__(self, loop: asyncio.AbstractEventLoop, standard_id: int, folder_path: str):
+        self.loop = loop
+        self.standard_id = standard_id
+        self.folder_path = folder_path
+        # Only touched on the event loop thread
+        self._timer = None
+        self._scan = None
     
-    # Get all clauses with their documents
-    cursor.execute("""
-        SELECT c.id, c.clause_number, c.title, c.weight,
-               COUNT(d.id) as doc_count
-        FROM clauses c
-        LEFT JOIN documents d ON c.id = d.clause_id AND d.status = 'active'
-        WHERE c.standard_id = ?
-        GROUP BY c.id
-    """, (standard_id,))
+    def on_any_event(self, event):
+        # Opened/closed events come from reads, including the rescan's own
+        if event.is_directory or event.event_type not in ("created", "modified", "deleted", "moved"):
+            return
+        # Called on the observer thread; the debounce timer lives on the event loop
+        try:
+            self.loop.call_soon_threadsafe(self._schedule_rescan)
+        except RuntimeError:
+            # The loop has closed (shutdown in progress); there is nothing left to rescan for
+            pass
     
-    clauses = cursor.fetchall()
-    conn.close()
+    def _schedule_rescan(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self.loop.call_later(RESCAN_DEBOUNCE_SECONDS, self._rescan)
     
-    total_clauses = len(clauses)
-    compliant_clauses = sum(1 for c in clauses if c['doc_count'] > 0)
-    total_weight = sum(c['weight'] for c in clauses)
-    weighted_score = sum(c['weight'] for c in clauses if c['doc_count'] > 0)
+    def _rescan(self):
+        self._timer = None
+        if self._scan is not None and not self._scan.done():
+            # Let the running scan finish, then scan again for these changes
+            self._schedule_rescan()
+            return
+        self._scan = self.loop.create_task(self._run_scan())
     
-    overall_score = (weighted_score / total_weight * 100) if total_weight > 0 else 0
+    async def _run_scan(self):
+        try:
+            await perform_scan(self.standard_id, self.folder_path)
+        except Exception as e:
+            print(f"Error rescanning monitored folder {self.folder_path}: {e}")
+
+def watch_folder(loop: asyncio.AbstractEventLoop, standard_id: int, folder_path: str,
+                 poll_interval: int = DEFAULT_POLL_INTERVAL):
+    """Start an observer that rescans folder_path when its files change (once per folder)"""
+    if folder_path in folder_observers:
+        # Already watched; a scan for another standard moves the folder to it
+        folder_observers[folder_path][1].standard_id = standard_id
+        return
+    if not os.path.isdir(folder_path):
+        return
     
-    missing_documents = [
-        {
-            "clause_number": c['clause_number'],
-            "title": c['title'],
-            "weight": c['weight']
-        }
-        for c in clauses if c['doc_count'] == 0
-    ]
-    
-    # Group by element (first digit of clause number)
-    element_scores = {}
-    for clause in clauses:
-        element = clause['clause_number'].split('.')[0]
-        if element not in element_scores:
-            element_scores[element] = {'total': 0, 'compliant': 0, 'weight': 0}
-        element_scores[element]['total'] += 1
-        element_scores[element]['weight'] += clause['weight']
-        if clause['doc_count'] > 0:
-            element_scores[element]['compliant'] += clause['weight']
-    
-    for element in element_scores:
-        if element_scores[element]['weight'] > 0:
-            element_scores[element]['score'] = (
-                element_scores[element]['compliant'] / element_scores[element]['weight'] * 100
+    handler = FolderChangeHandler(loop, standard_id, folder_path)
+    observer = create_folder_observer(folder_path, poll_interval)
+    observer.schedule(handler, folder_path, recursive=True)
+    observer.daemon = True
+    observer.start()
+    folder_observers[folder_path] = (observer, handler)
+
+async def start_folder_monitors():
+    """Watch every active monitored folder, each with its own poll_interval"""
+    def load_folders():
+        with db.read_conn() as conn:
+            return conn.execute(
+                "SELECT standard_id, folder_path, poll_interval FROM monitored_folders WHERE is_active = 1"
+            ).fetchall()
+    
+    rows = await asyncio.to_thread(load_folders)
+    
+    loop = asyncio.get_running_loop()
+    for standard_id, folder_path, poll_interval in rows:
+        try:
+            # Starting an observer walks the folder tree, so keep it off the event loop
+            await asyncio.to_thread(
+                watch_folder, loop, standard_id, folder_path, poll_interval or DEFAULT_POLL_INTERVAL
             )
-        else:
-            element_scores[element]['score'] = 0
+        except OSError as e:
+            print(f"Error watching monitored folder {folder_path}: {e}")
+
+def stop_folder_monitors():
+    """Stop every folder observer"""
+    observers = [observer for observer, _ in folder_observers.values()]
+    folder_observers.clear()
+    for observer in observers:
+        observer.stop()
+    for observer in observers:
+        observer.join()
+
+    
+# Compliance scoring
+# A clause is covered when it has at least one active document; its element is the
+# clause number up to the first '.' (the whole number when there is none)
+COMPLIANCE_ELEMENTS_SQL = """
+    WITH coverage AS (
+        SELECT CASE WHEN instr(c.clause_number, '.') > 0
+                    THEN substr(c.clause_number, 1, instr(c.clause_number, '.') - 1)
+                    ELSE c.clause_number END as element,
+               c.weight,
+               EXISTS (SELECT 1 FROM documents d
+                       WHERE d.clause_id = c.id AND d.status = 'active') as covered
+        FROM clauses c
+        WHERE c.standard_id = ?
+    )
+    SELECT element,
+           CASE WHEN SUM(weight) > 0
+                THEN SUM(CASE WHEN covered THEN weight ELSE 0 END) * 100.0 / SUM(weight)
+                ELSE 0 END as score,
+           SUM(COUNT(*)) OVER () as all_clauses,
+           SUM(SUM(covered)) OVER () as all_compliant,
+           CASE WHEN SUM(SUM(weight)) OVER () > 0
+                THEN SUM(SUM(CASE WHEN covered THEN weight ELSE 0 END)) OVER () * 100.0
+                     / SUM(SUM(weight)) OVER ()
+                ELSE 0 END as overall_score
+    FROM coverage
+    GROUP BY element
+"""
+
+MISSING_CLAUSES_SQL = """
+    SELECT c.clause_number, c.title, c.weight
+    FROM clauses c
+    WHERE c.standard_id = ?
+      AND NOT EXISTS (SELECT 1 FROM documents d
+                      WHERE d.clause_id = c.id AND d.status = 'active')
+    ORDER BY c.id
+"""
+
+@app.get("/api/compliance-score/{standard_id}")
+def get_compliance_score(standard_id: int) -> ComplianceScore:
+    """Calculate compliance score for a standard"""
+    with db.read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = db.dict_factory
+        
+        # Per-element totals; the window sums give the standard-wide figures on every row
+        cursor.execute(COMPLIANCE_ELEMENTS_SQL, (standard_id,))
+        elements = cursor.fetchall()
+        
+        cursor.execute(MISSING_CLAUSES_SQL, (standard_id,))
+        missing_documents = cursor.fetchall()
+    
+    if elements:
+        first = elements[0]
+        total_clauses = first['all_clauses']
+        compliant_clauses = first['all_compliant']
+        overall_score = first['overall_score']
+    else:
+        total_clauses = compliant_clauses = 0
+        overall_score = 0
     
     return ComplianceScore(
         standard_id=standard_id,
@@ -514,105 +935,99 @@ async def get_compliance_score(standard_id: int) -> ComplianceScore:
         total_clauses=total_clauses,
         compliant_clauses=compliant_clauses,
         missing_documents=missing_documents,
-        element_scores={k: round(v['score'], 2) for k, v in element_scores.items()}
+        element_scores={row['element']: round(row['score'], 2) for row in elements}
     )
 
 # Document management
 @app.post("/api/documents/upload")
-async def upload_document(clause_id: int, notes: Optional[str] = None, file: UploadFile = File(...)):
+def upload_document(clause_id: int, notes: Optional[str] = None, file: UploadFile = File(...)):
     """Upload a new document or revision"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Verify clause exists
-    cursor.execute("SELECT id FROM clauses WHERE id = ?", (clause_id,))
-    if not cursor.fetchone():
-        conn.close()
-        raise HTTPException(status_code=404, detail="Clause not found")
+    with db.read_conn() as conn:
+        if not conn.execute("SELECT id FROM clauses WHERE id = ?", (clause_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Clause not found")
     
-    # Save file
+    # Save and hash the file in one pass (this handler already runs on a worker thread)
     file_path = DOCUMENT_STORAGE / f"{clause_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    file_hash = calculate_file_hash(str(file_path))
+    file_hash = save_and_hash_upload(file.file, file_path)
     doc_type = get_file_type(file.filename)
     
-    # Create document entry
-    cursor.execute(
-        """INSERT INTO documents (clause_id, file_name, file_path, file_hash, document_type)
-           VALUES (?, ?, ?, ?, ?)""",
-        (clause_id, file.filename, str(file_path), file_hash, doc_type)
-    )
-    document_id = cursor.lastrowid
-    
-    # Create initial revision
-    cursor.execute(
-        """INSERT INTO document_revisions (document_id, revision_number, file_path, file_hash, notes)
-           VALUES (?, 1, ?, ?, ?)""",
-        (document_id, str(file_path), file_hash, notes)
-    )
-    
-    conn.commit()
-    conn.close()
+    with db.write_conn() as conn:
+        cursor = conn.cursor()
+        
+        # Create document entry
+        cursor.execute(
+            """INSERT INTO documents (clause_id, file_name, file_path, file_hash, document_type)
+               VALUES (?, ?, ?, ?, ?)""",
+            (clause_id, file.filename, str(file_path), file_hash, doc_type)
+        )
+        document_id = cursor.lastrowid
+        
+        # Create initial revision
+        cursor.execute(
+            """INSERT INTO document_revisions (document_id, revision_number, file_path, file_hash, notes)
+               VALUES (?, 1, ?, ?, ?)""",
+            (document_id, str(file_path), file_hash, notes)
+        )
     
     return {"id": document_id, "message": "Document uploaded successfully"}
 
 @app.get("/api/documents/{document_id}/revisions")
-async def get_document_revisions(document_id: int):
+def get_document_revisions(document_id: int):
     """Get all revisions for a document"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM document_revisions WHERE document_id = ? ORDER BY revision_number DESC",
-        (document_id,)
-    )
-    revisions = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    with db.read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = db.dict_factory
+        cursor.execute(
+            "SELECT * FROM document_revisions WHERE document_id = ? ORDER BY revision_number DESC",
+            (document_id,)
+        )
+        revisions = cursor.fetchall()
     return revisions
 
 # AI Configuration
 @app.post("/api/ai-config")
-async def configure_ai(config: AIConfigCreate):
+def configure_ai(config: AIConfigCreate):
     """Configure AI provider"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Deactivate all existing configs
-    cursor.execute("UPDATE ai_config SET is_active = 0")
-    
-    # Add new config
-    cursor.execute(
-        """INSERT INTO ai_config (provider, api_key, model_name, is_active)
-           VALUES (?, ?, ?, 1)""",
-        (config.provider, config.api_key, config.model_name)
-    )
+    with db.write_conn() as conn:
+        cursor = conn.cursor()
+        
+        # Deactivate all existing configs
+        cursor.execute("UPDATE ai_config SET is_active = 0")
+        
+        # Add new config
+        cursor.execute(
+            """INSERT INTO ai_config (provider, api_key, model_name, is_active)
+               VALUES (?, ?, ?, 1)""",
+            (config.provider, config.api_key, config.model_name)
+        )
     
-    conn.commit()
-    conn.close()
+    # Swap the new config into the AI module's in-memory CONFIG when it is loaded here
+    ai_integration = sys.modules.get("ai_integration")
+    if ai_integration is not None:
+        ai_integration.reload_config()
     return {"message": "AI configuration saved"}
 
 @app.get("/api/ai-config/active")
-async def get_active_ai_config():
+def get_active_ai_config():
     """Get active AI configuration"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT provider, model_name FROM ai_config WHERE is_active = 1")
-    config = cursor.fetchone()
-    conn.close()
+    with db.read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = db.dict_factory
+        cursor.execute("SELECT provider, model_name FROM ai_config WHERE is_active = 1")
+        config = cursor.fetchone()
     
     if not config:
         return {"provider": None, "model_name": None}
-    return dict(config)
+    return config
 
 # Document reassignment
 @app.post("/api/documents/{document_id}/reassign")
-async def reassign_document(document_id: int, request: ReassignRequest):
+def reassign_document(document_id: int, request: ReassignRequest):
     """Reassign a document to a different clause"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db.write_conn() as conn:
+        cursor = conn.cursor()
+        
         # Get current document details
         cursor.execute("SELECT id, clause_id, file_name FROM documents WHERE id = ?", (document_id,))
         document = cursor.fetchone()
@@ -650,8 +1065,6 @@ async def reassign_document(document_id: int, request: ReassignRequest):
              document_id)
         )
         
-        conn.commit()
-        
         # Get clause details for response
         cursor.execute(
             "SELECT clause_number, title FROM clauses WHERE id = ?",
@@ -666,26 +1079,24 @@ async def reassign_document(document_id: int, request: ReassignRequest):
             "old_clause_id": old_clause_id,
             "new_clause_id": request.new_clause_id
         }
-    finally:
-        conn.close()
 
 @app.get("/api/documents/unmatched")
-async def get_unmatched_documents():
+def get_unmatched_documents():
     """Get documents with low confidence scores"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT d.*, c.clause_number, c.title as clause_title
-        FROM documents d
-        JOIN clauses c ON d.clause_id = c.id
-        WHERE d.match_confidence < 0.5 AND d.status = 'active'
-        ORDER BY d.match_confidence ASC
-        LIMIT 100
-    """)
-    
-    documents = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    with db.read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = db.dict_factory
+        
+        cursor.execute("""
+            SELECT d.*, c.clause_number, c.title as clause_title
+            FROM documents d
+            JOIN clauses c ON d.clause_id = c.id
+            WHERE d.match_confidence < 0.5 AND d.status = 'active'
+            ORDER BY d.match_confidence ASC
+            LIMIT 100
+        """)
+        
+        documents = cursor.fetchall()
     
     return {"documents": documents, "total": len(documents)}
 
@@ -0,0 +1,94 @@
+"""
+Shared SQLite connection pool
+One writer connection plus a small pool of reader connections, all tuned for WAL
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = "compliance.db"
+
+PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA busy_timeout=5000;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA cache_size=-20000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA foreign_keys=ON;
+    PRAGMA wal_autocheckpoint=1000;
+"""
+
+POOL_SIZE = os.cpu_count() or 4
+# Per-connection prepared-statement cache (Python's default is 128)
+CACHED_STATEMENTS = 256
+
+_writer_conn = None
+_writer_lock = threading.Lock()
+_reader_pool = queue.Queue()
+_pool_lock = threading.Lock()
+_readers_created = 0
+
+def connect() -> sqlite3.Connection:
+    """Open a new connection with the standard PRAGMAs applied"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None,
+                           cached_statements=CACHED_STATEMENTS)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(PRAGMAS)
+    return conn
+
+def dict_factory(cursor: sqlite3.Cursor, row: tuple) -> dict:
+    """Row factory building plain dicts, for result sets returned to the client as-is"""
+    return dict(zip([column[0] for column in cursor.description], row))
+
+def _acquire_reader() -> sqlite3.Connection:
+    """Take a reader from the pool, opening a new one while under POOL_SIZE"""
+    global _readers_created
+    try:
+        return _reader_pool.get_nowait()
+    except queue.Empty:
+        pass
+
+    with _pool_lock:
+        if _readers_created < POOL_SIZE:
+            _readers_created += 1
+            return connect()
+
+    return _reader_pool.get()
+
+@contextmanager
+def read_conn():
+    """Borrow a pooled connection for read-only queries"""
+    conn = _acquire_reader()
+    try:
+        yield conn
+    finally:
+        _reader_pool.put(conn)
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """Run a burst of writes on an autocommit connection as one BEGIN IMMEDIATE transaction"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        # SQLite may already have rolled back (e.g. on SQLITE_FULL); don't mask the error
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+@contextmanager
+def write_conn():
+    """Use the single writer connection inside a transaction"""
+    global _writer_conn
+    with _writer_lock:
+        if _writer_conn is None:
+            _writer_conn = connect()
+
+        with transaction(_writer_conn):
+            yield _writer_conn
@@ -3,12 +3,18 @@ Enhanced Document Scanner with Content-Based Matching
 Improves on the basic filename matching with full text extraction and fuzzy matching.
 """
 
+import io
 import os
 import re
 import hashlib
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
-from collections import defaultdict
+from collections import Counter, defaultdict
+from itertools import chain
+from operator import itemgetter
 
 # File processing imports
 import PyPDF2
@@ -16,8 +22,110 @@ import docx
 from openpyxl import load_workbook
 from PIL import Image
 
-# Fuzzy matching
+# Fast PDF text extraction via MuPDF (Optional, PyPDF2 is the fallback)
+try:
+    import fitz
+    FITZ_AVAILABLE = True
+except ImportError:
+    FITZ_AVAILABLE = False
+
+# Rust-backed spreadsheet reader, also reads legacy .xls (Optional, openpyxl is the fallback)
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+# Fuzzy matching (RapidFuzz's C++ InDel ratio when installed, difflib otherwise).
+# The two are not interchangeable: InDel counts the longest common subsequence, difflib's
+# Ratcliff-Obershelp only contiguous matching blocks, so RapidFuzz scores are equal or higher
+# (e.g. 0.571 vs 0.540) and near-threshold filenames can match a different clause.
 from difflib import SequenceMatcher
+try:
+    from rapidfuzz import fuzz, process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# DFA-based regex engine for keyword tokenizing, no backtracking (Optional)
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+# Aho-Corasick automaton for finding every clause number in a filename at once (Optional)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Fast non-cryptographic hashing for scan change detection (Optional)
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# Hashing read size: large enough to amortise syscalls and let hashlib release the GIL
+HASH_CHUNK_SIZE = 1 << 20
+
+# Files needing text extraction before a scan starts worker processes: spawning
+# the pool costs more than extracting a handful of files in-process
+PARALLEL_MIN_FILES = 16
+
+# Keyword candidates: runs of 3+ lowercase letters/digits (shorter words are never keywords)
+_KEYWORD_RE = (re2 if RE2_AVAILABLE else re).compile(r'[a-z0-9]{3,}')
+
+# Common stop words excluded from keywords
+_STOP_WORDS = frozenset({
+    'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i',
+    'it', 'for', 'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at',
+    'this', 'but', 'his', 'by', 'from', 'they', 'we', 'say', 'her', 'she',
+    'or', 'an', 'will', 'my', 'one', 'all', 'would', 'there', 'their',
+    'what', 'so', 'up', 'out', 'if', 'about', 'who', 'get', 'which', 'go',
+    'me', 'when', 'make', 'can', 'like', 'time', 'no', 'just', 'him', 'know',
+    'take', 'people', 'into', 'year', 'your', 'good', 'some', 'could', 'them',
+    'see', 'other', 'than', 'then', 'now', 'look', 'only', 'come', 'its', 'over',
+    'also', 'back', 'after', 'use', 'two', 'how', 'our', 'work', 'first', 'well',
+    'way', 'even', 'new', 'want', 'because', 'any', 'these', 'give', 'day', 'most', 'us'
+})
+
+# Largest contribution keyword overlap can make to a match score
+KEYWORD_WEIGHT = 0.30
+
+# Keyword sets as (bitmask over the clause keyword vocabulary, number of keywords)
+KeywordBits = Tuple[int, int]
+
+# Per-scan clause precompute: (keyword -> bit vocabulary, clause id -> KeywordBits,
+# clause number matcher from build_clause_number_matcher, lowercased clause titles)
+KeywordIndex = Tuple[Dict[str, int], Dict[int, KeywordBits], object, List[str]]
+
+# Population count for keyword bitmasks (int.bit_count is Python 3.10+)
+_popcount = getattr(int, 'bit_count', None) or (lambda n: bin(n).count('1'))
+
+
+def _clean_filename(filename: str) -> str:
+    """Strip the separators ('.', '-', '_') that clause numbers are compared without."""
+    # Chained replace beats str.translate here: each is a single C pass and filenames are short
+    return filename.replace('.', '').replace('-', '').replace('_', '')
+
+
+class _TextBuffer:
+    """Joins extracted text pieces with single spaces like ' '.join, writing each to a StringIO as it arrives."""
+    
+    def __init__(self):
+        self._buf = io.StringIO()
+        self._sep = ''
+    
+    def append(self, piece: str) -> None:
+        self._buf.write(self._sep)
+        self._buf.write(piece)
+        self._sep = ' '
+    
+    def getvalue(self) -> str:
+        return self._buf.getvalue()
 
 
 class EnhancedDocumentScanner:
@@ -39,16 +147,27 @@ class EnhancedDocumentScanner:
     # ==================== TEXT EXTRACTION ====================
     
     def _extract_pdf_text(self, file_path: str) -> str:
-        """Extract text from PDF files."""
+        """Extract text from PDF files, with PyMuPDF when installed."""
+        if FITZ_AVAILABLE:
+            try:
+                text = _TextBuffer()
+                with fitz.open(file_path) as doc:
+                    for page in doc:
+                        text.append(page.get_text("text"))
+                return text.getvalue()
+            except Exception as e:  # includes fitz.FileDataError for corrupt or non-PDF files
+                print(f"Error extracting PDF text from {file_path}: {e}")
+                return ""
+        
         try:
-            text = []
+            text = _TextBuffer()
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 for page in pdf_reader.pages:
                     page_text = page.extract_text()
                     if page_text:
                         text.append(page_text)
-            return ' '.join(text)
+            return text.getvalue()
         except Exception as e:
             print(f"Error extracting PDF text from {file_path}: {e}")
             return ""
@@ -57,7 +176,7 @@ class EnhancedDocumentScanner:
         """Extract text from Word documents."""
         try:
             doc = docx.Document(file_path)
-            text = []
+            text = _TextBuffer()
             
             # Extract paragraphs
             for paragraph in doc.paragraphs:
@@ -71,16 +190,35 @@ class EnhancedDocumentScanner:
                         if cell.text.strip():
                             text.append(cell.text)
             
-            return ' '.join(text)
+            return text.getvalue()
         except Exception as e:
             print(f"Error extracting DOCX text from {file_path}: {e}")
             return ""
     
     def _extract_xlsx_text(self, file_path: str) -> str:
-        """Extract text from Excel spreadsheets."""
+        """Extract text from Excel spreadsheets, with python-calamine when installed."""
+        if CALAMINE_AVAILABLE:
+            try:
+                workbook = CalamineWorkbook.from_path(file_path)
+                text = _TextBuffer()
+                
+                for sheet_name in workbook.sheet_names:
+                    text.append(f"Sheet: {sheet_name}")
+                    
+                    # Calamine returns empty cells as ''
+                    for row in workbook.get_sheet_by_name(sheet_name).to_python():
+                        row_text = ' '.join([str(cell) for cell in row if cell is not None and cell != ''])
+                        if row_text.strip():
+                            text.append(row_text)
+                
+                return text.getvalue()
+            except Exception as e:
+                print(f"Error extracting XLSX text from {file_path}: {e}")
+                return ""
+        
         try:
             workbook = load_workbook(file_path, read_only=True, data_only=True)
-            text = []
+            text = _TextBuffer()
             
             for sheet_name in workbook.sheetnames:
                 sheet = workbook[sheet_name]
@@ -91,7 +229,7 @@ class EnhancedDocumentScanner:
                     if row_text.strip():
                         text.append(row_text)
             
-            return ' '.join(text)
+            return text.getvalue()
         except Exception as e:
             print(f"Error extracting XLSX text from {file_path}: {e}")
             return ""
@@ -130,112 +268,189 @@ class EnhancedDocumentScanner:
         Extract meaningful keywords from text.
         Filters out common stop words and keeps domain-relevant terms.
         """
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove special characters but keep spaces
-        text = re.sub(r'[^a-z0-9\s]', ' ', text)
-        
-        # Split into words
-        words = text.split()
-        
-        # Common stop words to exclude
-        stop_words = {
-            'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i',
-            'it', 'for', 'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at',
-            'this', 'but', 'his', 'by', 'from', 'they', 'we', 'say', 'her', 'she',
-            'or', 'an', 'will', 'my', 'one', 'all', 'would', 'there', 'their',
-            'what', 'so', 'up', 'out', 'if', 'about', 'who', 'get', 'which', 'go',
-            'me', 'when', 'make', 'can', 'like', 'time', 'no', 'just', 'him', 'know',
-            'take', 'people', 'into', 'year', 'your', 'good', 'some', 'could', 'them',
-            'see', 'other', 'than', 'then', 'now', 'look', 'only', 'come', 'its', 'over',
-            'also', 'back', 'after', 'use', 'two', 'how', 'our', 'work', 'first', 'well',
-            'way', 'even', 'new', 'want', 'because', 'any', 'these', 'give', 'day', 'most', 'us'
-        }
-        
-        # Filter words
-        keywords = [
-            word for word in words 
-            if len(word) > 2 and word not in stop_words
-        ]
+        # Lowercase and tokenize in one pass; special characters separate words
+        words = _KEYWORD_RE.findall(text.lower())
         
-        # Count frequency
-        word_freq = defaultdict(int)
-        for word in keywords:
-            word_freq[word] += 1
-        
-        # Return top N most frequent
-        sorted_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        return [word for word, freq in sorted_keywords[:top_n]]
+        # Count frequency (Counter counts a list in C), drop stop words, return the top N most frequent
+        word_freq = Counter(words)
+        for word in _STOP_WORDS.intersection(word_freq):
+            del word_freq[word]
+        return [word for word, freq in word_freq.most_common(top_n)]
     
     # ==================== MATCHING ALGORITHMS ====================
     
     def fuzzy_match_score(self, text1: str, text2: str) -> float:
         """
         Calculate fuzzy match score between two strings.
-        Returns a score between 0 and 1.
+        Returns a score between 0 and 1 (RapidFuzz's InDel ratio when installed, which can
+        exceed difflib's ratio for the same pair).
         """
+        if RAPIDFUZZ_AVAILABLE:
+            return fuzz.ratio(text1.lower(), text2.lower()) / 100.0
         return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
     
-    def keyword_overlap_score(self, doc_keywords: List[str], clause_keywords: List[str]) -> float:
+    def title_match_scores(self, doc_filename: str, clause_titles: List[str]) -> List[float]:
         """
-        Calculate overlap between document and clause keywords.
+        fuzzy_match_score of a filename against every lowercased clause title, in order.
+        RapidFuzz scores the whole row in one C call.
+        """
+        doc_filename = doc_filename.lower()
+        if RAPIDFUZZ_AVAILABLE:
+            scores = [0.0] * len(clause_titles)
+            for _, score, index in process.extract(doc_filename, clause_titles, scorer=fuzz.ratio, limit=None):
+                scores[index] = score / 100.0
+            return scores
+        return [SequenceMatcher(None, doc_filename, title).ratio() for title in clause_titles]
+    
+    def keyword_bits(self, keywords: List[str], vocabulary: Dict[str, int]) -> KeywordBits:
+        """
+        Encode distinct keywords as a bitmask over the vocabulary plus their count.
+        Keywords outside the vocabulary only contribute to the count.
+        """
+        mask = 0
+        for word in keywords:
+            bit = vocabulary.get(word)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask, len(keywords)
+    
+    def keyword_overlap_score(self, doc_keywords: KeywordBits, clause_keywords: KeywordBits) -> float:
+        """
+        Calculate overlap (Jaccard) between document and clause keywords.
         Returns a score between 0 and 1.
         """
-        if not doc_keywords or not clause_keywords:
+        doc_mask, doc_count = doc_keywords
+        clause_mask, clause_count = clause_keywords
+        if not doc_count or not clause_count:
             return 0.0
         
-        doc_set = set(doc_keywords)
-        clause_set = set(clause_keywords)
-        
-        intersection = len(doc_set & clause_set)
-        union = len(doc_set | clause_set)
+        intersection = _popcount(doc_mask & clause_mask)
+        union = doc_count + clause_count - intersection
         
         return intersection / union if union > 0 else 0.0
     
-    def calculate_match_score(
+    def filename_match_score(
         self,
         doc_filename: str,
-        doc_text: str,
         clause_number: str,
         clause_title: str,
-        clause_description: str
+        number_hit: Optional[bool] = None,
+        title_match: Optional[float] = None
     ) -> float:
         """
-        Calculate comprehensive match score between document and clause.
-        
-        Scoring weights:
-        - Clause number in filename: 40%
-        - Fuzzy match with clause title: 30%
-        - Keyword overlap: 30%
+        Score the filename components of a match: clause number in filename (40%)
+        and fuzzy match with clause title (30%). number_hit and title_match are the
+        precomputed checks from clause_number_hits and title_match_scores, if available.
         """
         score = 0.0
         
         # 1. Check for clause number in filename (40% weight)
-        if clause_number:
+        if number_hit is None and clause_number:
             # Clean clause number (e.g., "6.1.2" or "6.1.2.1")
             clause_num_clean = clause_number.replace('.', '')
-            if clause_num_clean in doc_filename.replace('.', '').replace('-', '').replace('_', ''):
-                score += 0.40
+            number_hit = clause_num_clean in _clean_filename(doc_filename)
+        if number_hit:
+            score += 0.40
         
         # 2. Fuzzy match filename with clause title (30% weight)
-        title_match = self.fuzzy_match_score(doc_filename, clause_title)
+        if title_match is None:
+            title_match = self.fuzzy_match_score(doc_filename, clause_title)
         score += title_match * 0.30
         
+        return score
+    
+    def calculate_match_score(
+        self,
+        doc_filename: str,
+        doc_keywords: KeywordBits,
+        clause_number: str,
+        clause_title: str,
+        clause_keywords: KeywordBits
+    ) -> float:
+        """
+        Calculate comprehensive match score between document and clause.
+        Keywords are extracted by the caller, once per document and once per clause.
+        
+        Scoring weights:
+        - Clause number in filename: 40%
+        - Fuzzy match with clause title: 30%
+        - Keyword overlap: 30%
+        """
+        score = self.filename_match_score(doc_filename, clause_number, clause_title)
+        
         # 3. Keyword overlap between doc content and clause description (30% weight)
-        if doc_text and clause_description:
-            doc_keywords = self.extract_keywords(doc_text, top_n=30)
-            clause_keywords = self.extract_keywords(clause_description, top_n=30)
-            keyword_score = self.keyword_overlap_score(doc_keywords, clause_keywords)
-            score += keyword_score * 0.30
+        keyword_score = self.keyword_overlap_score(doc_keywords, clause_keywords)
+        score += keyword_score * KEYWORD_WEIGHT
         
         return min(score, 1.0)  # Cap at 1.0
     
+    def build_keyword_index(self, clauses: List[Dict]) -> KeywordIndex:
+        """
+        Extract description keywords and clause numbers for each clause once.
+        
+        Returns:
+            Tuple of (keyword -> bit vocabulary, clause id -> KeywordBits, clause number matcher,
+            lowercased clause titles)
+        """
+        clause_words = {
+            clause['id']: self.extract_keywords(clause['description'], top_n=30)
+            if clause.get('description') else []
+            for clause in clauses
+        }
+        vocabulary = {}
+        for words in clause_words.values():
+            for word in words:
+                vocabulary.setdefault(word, len(vocabulary))
+        clause_bits = {
+            clause_id: self.keyword_bits(words, vocabulary)
+            for clause_id, words in clause_words.items()
+        }
+        clause_titles = [(clause.get('title') or '').lower() for clause in clauses]
+        return vocabulary, clause_bits, self.build_clause_number_matcher(clauses), clause_titles
+    
+    def build_clause_number_matcher(self, clauses: List[Dict]):
+        """
+        Map cleaned clause numbers ("6.1.2" -> "612") to clause ids, as an
+        Aho-Corasick automaton when pyahocorasick is installed, else a dict.
+        """
+        numbers = defaultdict(list)
+        for clause in clauses:
+            if clause.get('clause_number'):
+                numbers[clause['clause_number'].replace('.', '')].append(clause['id'])
+        if not AHOCORASICK_AVAILABLE or '' in numbers:
+            return dict(numbers)
+        
+        automaton = ahocorasick.Automaton()
+        for number, clause_ids in numbers.items():
+            automaton.add_word(number, clause_ids)
+        automaton.make_automaton()
+        return automaton
+    
+    def clause_number_hits(self, doc_filename: str, matcher) -> set:
+        """Ids of clauses whose cleaned number appears in the cleaned filename."""
+        cleaned = _clean_filename(doc_filename)
+        hits = set()
+        if isinstance(matcher, dict):
+            for number, clause_ids in matcher.items():
+                if number in cleaned:
+                    hits.update(clause_ids)
+        elif len(matcher):
+            for _, clause_ids in matcher.iter(cleaned):
+                hits.update(clause_ids)
+        return hits
+    
+    def document_keywords(self, file_path: str) -> List[str]:
+        """Extract a document's text and return its top keywords."""
+        doc_text, _ = self.extract_text_from_file(file_path)
+        return self.extract_keywords(doc_text, top_n=30) if doc_text else []
+    
     def match_document_to_clauses(
         self,
         file_path: str,
         clauses: List[Dict],
-        threshold: float = 0.3
+        threshold: float = 0.3,
+        keyword_index: Optional[KeywordIndex] = None,
+        doc_words: Optional[List[str]] = None
     ) -> List[Tuple[int, float, str]]:
         """
         Match a document to the most relevant clauses.
@@ -244,50 +459,85 @@ class EnhancedDocumentScanner:
             file_path: Path to the document
             clauses: List of clause dictionaries with id, clause_number, title, description
             threshold: Minimum score to consider a match (default 0.3)
+            keyword_index: Precomputed build_keyword_index(clauses), built here if omitted
+            doc_words: Precomputed document_keywords(file_path); skips text extraction.
+                Without it the text is only extracted when filename scores leave a clause in reach.
         
         Returns:
             List of tuples (clause_id, match_score, reason) sorted by score descending
         """
-        # Extract text from document
-        doc_text, doc_filename = self.extract_text_from_file(file_path)
+        return self._score_document(file_path, clauses, threshold, keyword_index, doc_words)[1]
+    
+    def _score_document(self, file_path, clauses, threshold, keyword_index, doc_words, limit=None):
+        """Score a document against every clause; returns (doc_words, up to limit best matches)."""
+        if keyword_index is None:
+            keyword_index = self.build_keyword_index(clauses)
+        vocabulary, clause_keywords, number_matcher, clause_titles = keyword_index
+        doc_filename = Path(file_path).stem
+        number_hits = self.clause_number_hits(doc_filename, number_matcher)
+        title_matches = self.title_match_scores(doc_filename, clause_titles)
         
-        # Calculate scores for each clause
-        matches = []
-        for clause in clauses:
-            score = self.calculate_match_score(
-                doc_filename=doc_filename,
-                doc_text=doc_text,
-                clause_number=clause.get('clause_number', ''),
-                clause_title=clause.get('title', ''),
-                clause_description=clause.get('description', '')
+        # Filename components first: keyword overlap adds at most KEYWORD_WEIGHT, so clauses that
+        # cannot reach the threshold even with it are dropped without reading the document
+        candidates = []
+        for clause, title_match in zip(clauses, title_matches):
+            number_hit = clause['id'] in number_hits
+            name_score = self.filename_match_score(
+                doc_filename, clause.get('clause_number', ''), clause.get('title', ''),
+                number_hit, title_match
             )
+            if name_score + KEYWORD_WEIGHT >= threshold:
+                candidates.append((clause, name_score, number_hit, title_match))
+        
+        # Extract keywords from document, only if some clause can still match
+        if doc_words is None and candidates:
+            doc_words = self.document_keywords(file_path)
+        doc_keywords = self.keyword_bits(doc_words or [], vocabulary)
+        
+        # Calculate scores for the remaining clauses
+        scored = []
+        for clause, name_score, number_hit, title_match in candidates:
+            keyword_score = self.keyword_overlap_score(doc_keywords, clause_keywords[clause['id']])
+            score = min(name_score + keyword_score * KEYWORD_WEIGHT, 1.0)  # Cap at 1.0
             
             if score >= threshold:
-                # Generate reason for match
-                reason = self._generate_match_reason(
-                    score, doc_filename, clause.get('clause_number', ''), 
-                    clause.get('title', '')
-                )
-                matches.append((clause['id'], score, reason))
+                scored.append((score, clause, number_hit, title_match))
         
-        # Sort by score descending
-        matches.sort(key=lambda x: x[1], reverse=True)
-        return matches
+        # Sort by score descending; with a limit, select the top entries without a full sort
+        if limit is None:
+            scored.sort(key=itemgetter(0), reverse=True)
+        else:
+            scored = heapq.nlargest(limit, scored, key=itemgetter(0))
+        
+        # Generate reasons only for the matches that are returned
+        matches = [
+            (clause['id'], score, self._generate_match_reason(
+                score, doc_filename, clause.get('clause_number', ''), 
+                clause.get('title', ''), number_hit, title_match
+            ))
+            for score, clause, number_hit, title_match in scored
+        ]
+        return doc_words, matches
     
     def _generate_match_reason(
         self, 
         score: float, 
         filename: str, 
         clause_number: str, 
-        clause_title: str
+        clause_title: str,
+        number_hit: Optional[bool] = None,
+        title_match: Optional[float] = None
     ) -> str:
         """Generate human-readable reason for why document matched clause."""
         reasons = []
         
-        if clause_number and clause_number.replace('.', '') in filename.replace('.', '').replace('-', '').replace('_', ''):
+        if number_hit is None:
+            number_hit = bool(clause_number) and clause_number.replace('.', '') in _clean_filename(filename)
+        if number_hit:
             reasons.append(f"contains clause number '{clause_number}'")
         
-        title_match = self.fuzzy_match_score(filename, clause_title)
+        if title_match is None:
+            title_match = self.fuzzy_match_score(filename, clause_title)
         if title_match > 0.5:
             reasons.append(f"filename similar to clause title ({int(title_match*100)}% match)")
         
@@ -303,7 +553,9 @@ class EnhancedDocumentScanner:
         folder_path: str,
         clauses: List[Dict],
         match_threshold: float = 0.3,
-        max_matches_per_doc: int = 3
+        max_matches_per_doc: int = 3,
+        max_workers: Optional[int] = None,
+        keyword_cache: Optional[Dict[str, Tuple[int, int, List[str]]]] = None
     ) -> Dict:
         """
         Scan an entire folder and match documents to clauses.
@@ -313,9 +565,14 @@ class EnhancedDocumentScanner:
             clauses: List of clause dictionaries
             match_threshold: Minimum score to consider a match
             max_matches_per_doc: Maximum number of clause matches per document
+            max_workers: Worker processes for text extraction and matching
+                (default: CPU count; 1 matches in this process)
+            keyword_cache: Document keywords from earlier scans, {path: (size, mtime_ns, keywords)};
+                files whose size and mtime are unchanged are not re-extracted
         
         Returns:
-            Dictionary with scan results and statistics
+            Dictionary with scan results and statistics. 'keyword_updates' lists
+            (path, size, mtime_ns, keywords) for every file extracted by this scan.
         """
         if not os.path.exists(folder_path):
             raise ValueError(f"Folder path does not exist: {folder_path}")
@@ -325,54 +582,191 @@ class EnhancedDocumentScanner:
             'documents_matched': 0,
             'total_matches': 0,
             'unmatched_documents': [],
-            'matches': []  # List of {file_path, clause_matches: [(clause_id, score, reason)]}
+            'matches': [],  # List of {file_path, clause_matches: [(clause_id, score, reason)]}
+            'keyword_updates': []
         }
         
-        # Scan all files recursively
-        for root, dirs, files in os.walk(folder_path):
-            for filename in files:
-                file_path = os.path.join(root, filename)
-                file_ext = Path(file_path).suffix.lower()
-                
-                # Skip unsupported file types
-                if file_ext not in self.supported_extensions:
-                    continue
-                
-                results['documents_scanned'] += 1
-                
-                # Match document to clauses
-                matches = self.match_document_to_clauses(
-                    file_path, 
-                    clauses, 
-                    threshold=match_threshold
-                )
-                
-                # Take top N matches
-                top_matches = matches[:max_matches_per_doc]
-                
-                if top_matches:
-                    results['documents_matched'] += 1
-                    results['total_matches'] += len(top_matches)
-                    results['matches'].append({
-                        'file_path': file_path,
-                        'file_name': filename,
-                        'clause_matches': top_matches
-                    })
-                else:
-                    results['unmatched_documents'].append({
-                        'file_path': file_path,
-                        'file_name': filename
-                    })
+        # Clause keywords are the same for every document
+        keyword_index = self.build_keyword_index(clauses)
+        
+        # Walk the folder lazily, so matching starts while directories are still being listed
+        tasks = self._iter_tasks(folder_path, keyword_cache or {})
+        
+        # Match documents to clauses
+        for (entry, st, cached_words), (doc_words, matches) in self._match_files(
+            tasks, clauses, match_threshold, keyword_index, max_matches_per_doc, max_workers
+        ):
+            results['documents_scanned'] += 1
+            file_path = entry.path
+            filename = entry.name
+            if cached_words is None and doc_words is not None:
+                results['keyword_updates'].append((file_path, st.st_size, st.st_mtime_ns, doc_words))
+            
+            # Take top N matches
+            top_matches = matches[:max_matches_per_doc]
+            
+            if top_matches:
+                results['documents_matched'] += 1
+                results['total_matches'] += len(top_matches)
+                # Size and mtime come from the directory walk, so callers need not stat again
+                results['matches'].append({
+                    'file_path': file_path,
+                    'file_name': filename,
+                    'size': st.st_size,
+                    'mtime_ns': st.st_mtime_ns,
+                    'clause_matches': top_matches
+                })
+            else:
+                results['unmatched_documents'].append({
+                    'file_path': file_path,
+                    'file_name': filename
+                })
         
         return results
     
+    def scan_file(self, file_path, doc_words, clauses, match_threshold, keyword_index, max_matches=None):
+        """
+        Match one file, extracting its keywords unless doc_words is given.
+        Returns (doc_words, best max_matches matches); doc_words stays None if no clause could match.
+        """
+        return self._score_document(
+            file_path, clauses, match_threshold, keyword_index, doc_words, max_matches
+        )
+    
+    def _iter_tasks(self, folder_path: str, keyword_cache: Dict[str, Tuple[int, int, List[str]]]):
+        """
+        Yield (entry, stat, cached_words) for every supported file under folder_path.
+        cached_words is None unless the keyword cache matches the file's size and mtime.
+        """
+        for entry in self._iter_files(folder_path):
+            # Skip unsupported file types
+            if os.path.splitext(entry.name)[1].lower() not in self.supported_extensions:
+                continue
+            
+            try:
+                st = entry.stat()
+            except OSError:
+                # Deleted or made unreadable since the directory was listed
+                continue
+            cached = keyword_cache.get(entry.path)
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                yield entry, st, cached[2]
+            else:
+                yield entry, st, None
+    
+    def _match_files(self, tasks, clauses, match_threshold, keyword_index, max_matches, max_workers):
+        """
+        Yield (task, (doc_words, matches)) for each _iter_tasks task in order,
+        in a process pool once PARALLEL_MIN_FILES files need text extraction.
+        """
+        # Walk until enough files need extraction; small or mostly cached folders never start the pool
+        head = []
+        to_extract = 0
+        for task in tasks:
+            head.append(task)
+            to_extract += task[2] is None
+            if to_extract >= PARALLEL_MIN_FILES:
+                break
+        
+        if max_workers == 1 or to_extract < PARALLEL_MIN_FILES:
+            for task in chain(head, tasks):
+                entry, _, doc_words = task
+                yield task, self.scan_file(
+                    entry.path, doc_words, clauses, match_threshold, keyword_index, max_matches
+                )
+            return
+        
+        # Submission drains the rest of the walk; workers start on the first chunks meanwhile
+        walked = []
+        
+        def submissions():
+            for task in chain(head, tasks):
+                walked.append(task)
+                yield task[0].path, task[2]
+        
+        # Spawned (not forked) workers: the backend calls this from a threaded server process
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_scan_worker,
+            initargs=(clauses, match_threshold, keyword_index, max_matches)
+        ) as executor:
+            for result, task in zip(executor.map(_scan_one, submissions(), chunksize=8), walked):
+                yield task, result
+    
+    def _iter_files(self, folder_path: str):
+        """Walk folder_path top-down with os.scandir, yielding a DirEntry for every file."""
+        pending = [folder_path]
+        while pending:
+            subdirs = []
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.is_file():
+                                yield entry
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            # Visit subdirectories in listing order, as os.walk does
+            pending.extend(reversed(subdirs))
+    
     def calculate_file_hash(self, file_path: str) -> str:
         """Calculate MD5 hash of file for change detection."""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        with open(file_path, "rb", buffering=0) as f:
+            _advise_sequential(f)
+            if hasattr(hashlib, "file_digest"):
+                return hashlib.file_digest(f, "md5").hexdigest()
+            # Python < 3.11
+            return _hash_stream(f, hashlib.md5()).hexdigest()
+    
+    def calculate_scan_hash(self, file_path: str) -> str:
+        """Fast change-detection hash: xxh3_64 when xxhash is installed, otherwise MD5."""
+        if not XXHASH_AVAILABLE:
+            return self.calculate_file_hash(file_path)
+        with open(file_path, "rb", buffering=0) as f:
+            _advise_sequential(f)
+            return _hash_stream(f, xxhash.xxh3_64()).hexdigest()
+
+
+# ==================== FILE HASHING ====================
+
+def _advise_sequential(f) -> None:
+    """Hint the kernel to read ahead aggressively; a no-op where posix_fadvise is unavailable."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+def _hash_stream(f, hasher):
+    """Feed an unbuffered file to hasher through one reused HASH_CHUNK_SIZE buffer."""
+    buf = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buf)
+    while n := f.readinto(buf):
+        hasher.update(view[:n])
+    return hasher
+
+
+# ==================== PARALLEL SCANNING ====================
+
+# Per-process state for scan_folder's worker pool, set once by _init_scan_worker
+_worker_scanner = None
+_worker_args = None
+
+def _init_scan_worker(clauses: List[Dict], match_threshold: float, keyword_index, max_matches: int) -> None:
+    """Pool initializer: ship the clauses and keyword index to each worker once."""
+    global _worker_scanner, _worker_args
+    _worker_scanner = EnhancedDocumentScanner()
+    _worker_args = (clauses, match_threshold, keyword_index, max_matches)
+
+def _scan_one(task: Tuple[str, Optional[List[str]]]) -> Tuple[List[str], List[Tuple[int, float, str]]]:
+    """Match one (file_path, cached_words) task to the clauses inside a worker process."""
+    file_path, doc_words = task
+    return _worker_scanner.scan_file(file_path, doc_words, *_worker_args)
 
 
 # ==================== USAGE EXAMPLE ====================
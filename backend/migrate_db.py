@@ -1,52 +1,92 @@
 """
 Database migration script - adds new columns for enhanced matching
 """
-import sqlite3
+import db
 
-DB_PATH = "compliance.db"
+# (table, column, definition) for every column added since the original schema
+MIGRATIONS = [
+    # Enhanced matching results on documents
+    ("documents", "match_confidence", "REAL DEFAULT 0.0"),
+    ("documents", "match_reason", "TEXT"),
+    # Scan statistics
+    ("scan_history", "documents_matched", "INTEGER DEFAULT 0"),
+    ("scan_history", "documents_added", "INTEGER DEFAULT 0"),
+    ("scan_history", "documents_updated", "INTEGER DEFAULT 0"),
+    # Polling interval for monitored folders (used for folders on network shares)
+    ("monitored_folders", "poll_interval", "INTEGER DEFAULT 60"),
+    # Fast change-detection hashes used by folder scans
+    ("documents", "scan_hash", "TEXT"),
+    ("document_revisions", "scan_hash", "TEXT"),
+    # Semantic cache scope and expiry (rows without them never match again)
+    ("doc_embeddings", "provider", "TEXT"),
+    ("doc_embeddings", "model", "TEXT"),
+    ("doc_embeddings", "prompt_version", "TEXT"),
+    ("doc_embeddings", "expires_at", "INTEGER"),
+    # Per-request failures reported by AI batch jobs
+    ("ai_batch_jobs", "errors", "TEXT"),
+]
+
+def migrate_unique_clause_numbers(cursor):
+    """Make idx_clauses_standard_number unique once no standard repeats a clause number"""
+    unique = {row[1]: row[2] for row in cursor.execute("PRAGMA index_list(clauses)")}
+    if unique.get("idx_clauses_standard_number"):
+        print("✓ Clause numbers already unique per standard")
+        return
+    
+    duplicates = cursor.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM clauses GROUP BY standard_id, clause_number HAVING COUNT(*) > 1
+        )
+    """).fetchone()[0]
+    if duplicates:
+        print(f"✗ {duplicates} clause numbers are repeated within a standard; "
+              "remove the duplicates and rerun to enforce uniqueness")
+        return
+    
+    cursor.execute("DROP INDEX IF EXISTS idx_clauses_standard_number")
+    cursor.execute("""
+        CREATE UNIQUE INDEX idx_clauses_standard_number
+        ON clauses(standard_id, clause_number)
+    """)
+    print("✓ Clause numbers are now unique per standard")
 
 def migrate():
-    conn = sqlite3.connect(DB_PATH)
+    # Shared connection setup: WAL, synchronous=NORMAL and explicit transactions
+    conn = db.connect()
     cursor = conn.cursor()
     
     print("Starting database migration...")
     
-    # Add match_confidence to documents table
-    try:
-        cursor.execute("ALTER TABLE documents ADD COLUMN match_confidence REAL DEFAULT 0.0")
-        print("✓ Added match_confidence column to documents")
-    except sqlite3.OperationalError as e:
-        if "duplicate column" in str(e).lower():
-            print("✓ match_confidence column already exists")
-        else:
-            raise
-    
-    # Add match_reason to documents table
-    try:
-        cursor.execute("ALTER TABLE documents ADD COLUMN match_reason TEXT")
-        print("✓ Added match_reason column to documents")
-    except sqlite3.OperationalError as e:
-        if "duplicate column" in str(e).lower():
-            print("✓ match_reason column already exists")
-        else:
-            raise
+    # Read each table's columns once instead of probing with ALTER TABLE
+    columns = {}
+    for table in {table for table, _, _ in MIGRATIONS}:
+        columns[table] = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
     
-    # Add new columns to scan_history
+    # All schema changes commit together
+    cursor.execute("BEGIN EXCLUSIVE")
     try:
-        cursor.execute("ALTER TABLE scan_history ADD COLUMN documents_matched INTEGER DEFAULT 0")
-        cursor.execute("ALTER TABLE scan_history ADD COLUMN documents_added INTEGER DEFAULT 0")
-        cursor.execute("ALTER TABLE scan_history ADD COLUMN documents_updated INTEGER DEFAULT 0")
-        print("✓ Added statistics columns to scan_history")
-    except sqlite3.OperationalError as e:
-        if "duplicate column" in str(e).lower():
-            print("✓ scan_history columns already exist")
-        else:
-            raise
+        for table, column, definition in MIGRATIONS:
+            if not columns[table]:
+                # Not created yet; backend.init_database creates it with every column
+                continue
+            if column in columns[table]:
+                print(f"✓ {table}.{column} column already exists")
+                continue
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            print(f"✓ Added {column} column to {table}")
+        
+        migrate_unique_clause_numbers(cursor)
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute("COMMIT")
     
-    conn.commit()
+    # Refresh planner statistics once so the composite indexes are used
+    cursor.execute("ANALYZE")
+    print("✓ Planner statistics updated")
     conn.close()
     
     print("\n✓ Migration completed successfully!")
 
 if __name__ == "__main__":
-    migrate()
\ No newline at end of file
+    migrate()
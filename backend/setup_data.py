@@ -3,287 +3,101 @@ Compliance Document Manager - Setup and Sample Data Loader
 Run this script to set up the database with ISO 45001 sample data
 """
 
+import argparse
 import sqlite3
+import sys
 from datetime import datetime
 import os
+from typing import NamedTuple, Optional
 
-DB_PATH = "compliance.db"
+import db
 
-def init_database():
-    """Initialize SQLite database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Standards table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS standards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            version TEXT,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Clauses/Requirements table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS clauses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            standard_id INTEGER NOT NULL,
-            clause_number TEXT NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT,
-            weight REAL DEFAULT 1.0,
-            parent_clause_id INTEGER,
-            FOREIGN KEY (standard_id) REFERENCES standards(id),
-            FOREIGN KEY (parent_clause_id) REFERENCES clauses(id)
-        )
-    """)
-    
-    # Documents table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clause_id INTEGER NOT NULL,
-            file_name TEXT NOT NULL,
-            file_path TEXT NOT NULL,
-            file_hash TEXT,
-            document_type TEXT,
-            status TEXT DEFAULT 'active',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_scanned TIMESTAMP,
-            FOREIGN KEY (clause_id) REFERENCES clauses(id)
-        )
-    """)
-    
-    # Document revisions table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS document_revisions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            document_id INTEGER NOT NULL,
-            revision_number INTEGER NOT NULL,
-            file_path TEXT NOT NULL,
-            file_hash TEXT NOT NULL,
-            notes TEXT,
-            created_by TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (document_id) REFERENCES documents(id)
-        )
-    """)
-    
-    # Scan history table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS scan_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            standard_id INTEGER NOT NULL,
-            folder_path TEXT NOT NULL,
-            documents_found INTEGER DEFAULT 0,
-            scan_duration REAL,
-            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            FOREIGN KEY (standard_id) REFERENCES standards(id)
-        )
-    """)
-    
-    # User corrections/learning table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_corrections (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            original_document_id INTEGER,
-            corrected_document_id INTEGER NOT NULL,
-            clause_id INTEGER NOT NULL,
-            reason TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (original_document_id) REFERENCES documents(id),
-            FOREIGN KEY (corrected_document_id) REFERENCES documents(id),
-            FOREIGN KEY (clause_id) REFERENCES clauses(id)
-        )
-    """)
-    
-    # AI configuration table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ai_config (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            provider TEXT NOT NULL,
-            api_key TEXT NOT NULL,
-            model_name TEXT,
-            is_active BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Monitored folders table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS monitored_folders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            standard_id INTEGER NOT NULL,
-            folder_path TEXT NOT NULL UNIQUE,
-            is_active BOOLEAN DEFAULT 1,
-            last_scan TIMESTAMP,
-            FOREIGN KEY (standard_id) REFERENCES standards(id)
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
-    print("✓ Database tables created successfully")
+DB_PATH = db.DB_PATH
 
-def load_iso45001_sample():
-    """Load ISO 45001 sample standard and clauses"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Create ISO 45001 standard
-    cursor.execute("""
-        INSERT OR IGNORE INTO standards (name, version, description)
-        VALUES (?, ?, ?)
-    """, (
-        "ISO 45001",
-        "2018",
-        "Occupational health and safety management systems - Requirements with guidance for use"
-    ))
-    
-    standard_id = cursor.lastrowid
-    if standard_id == 0:
-        cursor.execute("SELECT id FROM standards WHERE name = ?", ("ISO 45001",))
-        result = cursor.fetchone()
-        standard_id = result[0] if result else None
-    
-    if not standard_id:
-        raise Exception("Failed to create ISO 45001 standard")
-    
-    # ISO 45001 Clauses with realistic weights
-    clauses = [
-        # Context of the organization
-        ("4", "Context of the Organization", "Understanding organizational context and stakeholder needs", 2.0, None),
-        ("4.1", "Understanding the organization and its context", "Internal and external issues relevant to OH&S", 1.0, None),
-        ("4.2", "Understanding needs and expectations of workers", "Requirements of interested parties", 1.5, None),
-        ("4.3", "Determining scope of OH&S management system", "Boundaries and applicability", 2.0, None),
-        ("4.4", "OH&S management system", "Establishing, implementing, maintaining and continually improving", 2.5, None),
-        
-        # Leadership and worker participation
-        ("5", "Leadership and Worker Participation", "Top management commitment and participation", 3.0, None),
-        ("5.1", "Leadership and commitment", "Top management demonstrates leadership", 2.5, None),
-        ("5.2", "OH&S policy", "Establishing, implementing and maintaining policy", 3.0, None),
-        ("5.3", "Organizational roles, responsibilities and authorities", "Assigning and communicating responsibilities", 2.0, None),
-        ("5.4", "Consultation and participation of workers", "Processes for consultation and participation", 3.0, None),
-        
-        # Planning
-        ("6", "Planning", "Actions to address risks and opportunities", 4.0, None),
-        ("6.1", "Actions to address risks and opportunities", "General planning requirements", 4.0, None),
-        ("6.1.1", "General", "Planning to address risks and opportunities", 3.0, None),
-        ("6.1.2", "Hazard identification and assessment", "Processes for ongoing hazard identification", 5.0, None),
-        ("6.1.3", "Determination of legal and other requirements", "Identifying and accessing legal requirements", 4.0, None),
-        ("6.1.4", "Planning action", "Planning to take action on identified risks", 3.5, None),
-        ("6.2", "OH&S objectives and planning to achieve them", "Setting and planning objectives", 3.0, None),
-        
-        # Support
-        ("7", "Support", "Resources, competence, awareness, communication", 3.5, None),
-        ("7.1", "Resources", "Determining and providing resources", 2.5, None),
-        ("7.2", "Competence", "Determining and ensuring competence", 3.5, None),
-        ("7.3", "Awareness", "Workers awareness of OH&S policy and system", 2.5, None),
-        ("7.4", "Communication", "Internal and external communications", 3.0, None),
-        ("7.5", "Documented information", "Creating, updating and controlling documents", 2.5, None),
-        
-        # Operation
-        ("8", "Operation", "Operational planning and control", 4.5, None),
-        ("8.1", "Operational planning and control", "Planning, implementing and controlling processes", 4.0, None),
-        ("8.1.1", "General", "Operational planning requirements", 3.5, None),
-        ("8.1.2", "Eliminating hazards and reducing OH&S risks", "Hierarchy of controls", 5.0, None),
-        ("8.1.3", "Management of change", "Controlling planned temporary and permanent changes", 4.0, None),
-        ("8.1.4", "Procurement", "Controlling procurement of products and services", 3.5, None),
-        ("8.2", "Emergency preparedness and response", "Processes to prepare for and respond to emergencies", 4.5, None),
-        
-        # Performance evaluation
-        ("9", "Performance Evaluation", "Monitoring, measurement, analysis and evaluation", 3.5, None),
-        ("9.1", "Monitoring, measurement, analysis and performance evaluation", "General evaluation requirements", 3.5, None),
-        ("9.1.1", "General", "Monitoring and measurement requirements", 3.0, None),
-        ("9.1.2", "Evaluation of compliance", "Evaluating compliance with legal requirements", 4.0, None),
-        ("9.2", "Internal audit", "Conducting internal audits", 3.5, None),
-        ("9.3", "Management review", "Top management reviews of OH&S system", 3.5, None),
-        
-        # Improvement
-        ("10", "Improvement", "Incident, nonconformity and continual improvement", 4.0, None),
-        ("10.1", "General", "Determining opportunities for improvement", 3.0, None),
-        ("10.2", "Incident, nonconformity and corrective action", "Responding to incidents and nonconformities", 4.5, None),
-        ("10.3", "Continual improvement", "Continually improving suitability, adequacy and effectiveness", 3.5, None),
-    ]
-    
-    # Insert clauses
-    clause_map = {}
-    for clause_data in clauses:
-        clause_num, title, desc, weight, parent = clause_data
-        
-        parent_id = None
-        if '.' in clause_num:
-            parent_num = clause_num.rsplit('.', 1)[0]
-            parent_id = clause_map.get(parent_num)
-        
-        cursor.execute("""
-            INSERT INTO clauses (standard_id, clause_number, title, description, weight, parent_clause_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (standard_id, clause_num, title, desc, weight, parent_id))
-        
-        clause_map[clause_num] = cursor.lastrowid
-    
-    conn.commit()
-    conn.close()
-    
-    print(f"✓ ISO 45001 standard loaded successfully with {len(clauses)} clauses")
-    print(f"  Standard ID: {standard_id}")
+# INSERT ... RETURNING needs SQLite 3.35+
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
 
-def load_isnetworld_sample():
-    """Load ISNetworld sample standard"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+class SampleClause(NamedTuple):
+    """One row of sample clause data; parent is the row index of the parent clause"""
+    number: str
+    title: str
+    description: str
+    weight: float
+    parent: Optional[int] = None
+
+# ISO 45001 Clauses with realistic weights
+ISO45001_CLAUSES = (
+    # Context of the organization
+    SampleClause("4", "Context of the Organization", "Understanding organizational context and stakeholder needs", 2.0, None),
+    SampleClause("4.1", "Understanding the organization and its context", "Internal and external issues relevant to OH&S", 1.0, 0),
+    SampleClause("4.2", "Understanding needs and expectations of workers", "Requirements of interested parties", 1.5, 0),
+    SampleClause("4.3", "Determining scope of OH&S management system", "Boundaries and applicability", 2.0, 0),
+    SampleClause("4.4", "OH&S management system", "Establishing, implementing, maintaining and continually improving", 2.5, 0),
     
-    cursor.execute("""
-        INSERT OR IGNORE INTO standards (name, version, description)
-        VALUES (?, ?, ?)
-    """, (
-        "ISNetworld",
-        "2024",
-        "ISNetworld contractor safety compliance requirements"
-    ))
+    # Leadership and worker participation
+    SampleClause("5", "Leadership and Worker Participation", "Top management commitment and participation", 3.0, None),
+    SampleClause("5.1", "Leadership and commitment", "Top management demonstrates leadership", 2.5, 5),
+    SampleClause("5.2", "OH&S policy", "Establishing, implementing and maintaining policy", 3.0, 5),
+    SampleClause("5.3", "Organizational roles, responsibilities and authorities", "Assigning and communicating responsibilities", 2.0, 5),
+    SampleClause("5.4", "Consultation and participation of workers", "Processes for consultation and participation", 3.0, 5),
     
-    standard_id = cursor.lastrowid
-    if standard_id == 0:
-        cursor.execute("SELECT id FROM standards WHERE name = ?", ("ISNetworld",))
-        result = cursor.fetchone()
-        standard_id = result[0] if result else None
+    # Planning
+    SampleClause("6", "Planning", "Actions to address risks and opportunities", 4.0, None),
+    SampleClause("6.1", "Actions to address risks and opportunities", "General planning requirements", 4.0, 10),
+    SampleClause("6.1.1", "General", "Planning to address risks and opportunities", 3.0, 11),
+    SampleClause("6.1.2", "Hazard identification and assessment", "Processes for ongoing hazard identification", 5.0, 11),
+    SampleClause("6.1.3", "Determination of legal and other requirements", "Identifying and accessing legal requirements", 4.0, 11),
+    SampleClause("6.1.4", "Planning action", "Planning to take action on identified risks", 3.5, 11),
+    SampleClause("6.2", "OH&S objectives and planning to achieve them", "Setting and planning objectives", 3.0, 10),
     
-    if not standard_id:
-        raise Exception("Failed to create ISNetworld standard")
+    # Support
+    SampleClause("7", "Support", "Resources, competence, awareness, communication", 3.5, None),
+    SampleClause("7.1", "Resources", "Determining and providing resources", 2.5, 17),
+    SampleClause("7.2", "Competence", "Determining and ensuring competence", 3.5, 17),
+    SampleClause("7.3", "Awareness", "Workers awareness of OH&S policy and system", 2.5, 17),
+    SampleClause("7.4", "Communication", "Internal and external communications", 3.0, 17),
+    SampleClause("7.5", "Documented information", "Creating, updating and controlling documents", 2.5, 17),
     
-    # ISNetworld requirements (simplified)
-    requirements = [
-        ("1", "Safety Management System", "Overall safety management program", 4.0),
-        ("2", "Written Safety Programs", "Required written safety programs and procedures", 4.5),
-        ("3", "Training Programs", "Employee safety training and competency", 4.0),
-        ("4", "Incident Management", "Accident investigation and reporting", 3.5),
-        ("5", "Drug and Alcohol Program", "Substance abuse prevention program", 3.0),
-        ("6", "Safety Meetings", "Regular safety meeting documentation", 2.5),
-        ("7", "Equipment Inspection", "Equipment maintenance and inspection programs", 3.5),
-        ("8", "Emergency Response", "Emergency action plans and procedures", 3.0),
-        ("9", "Contractor Management", "Subcontractor safety management", 3.0),
-        ("10", "Insurance and Compliance", "Insurance certificates and regulatory compliance", 4.0),
-    ]
-    
-    for req_num, title, desc, weight in requirements:
-        cursor.execute("""
-            INSERT INTO clauses (standard_id, clause_number, title, description, weight)
-            VALUES (?, ?, ?, ?, ?)
-        """, (standard_id, req_num, title, desc, weight))
+    # Operation
+    SampleClause("8", "Operation", "Operational planning and control", 4.5, None),
+    SampleClause("8.1", "Operational planning and control", "Planning, implementing and controlling processes", 4.0, 23),
+    SampleClause("8.1.1", "General", "Operational planning requirements", 3.5, 24),
+    SampleClause("8.1.2", "Eliminating hazards and reducing OH&S risks", "Hierarchy of controls", 5.0, 24),
+    SampleClause("8.1.3", "Management of change", "Controlling planned temporary and permanent changes", 4.0, 24),
+    SampleClause("8.1.4", "Procurement", "Controlling procurement of products and services", 3.5, 24),
+    SampleClause("8.2", "Emergency preparedness and response", "Processes to prepare for and respond to emergencies", 4.5, 23),
     
-    conn.commit()
-    conn.close()
+    # Performance evaluation
+    SampleClause("9", "Performance Evaluation", "Monitoring, measurement, analysis and evaluation", 3.5, None),
+    SampleClause("9.1", "Monitoring, measurement, analysis and performance evaluation", "General evaluation requirements", 3.5, 30),
+    SampleClause("9.1.1", "General", "Monitoring and measurement requirements", 3.0, 31),
+    SampleClause("9.1.2", "Evaluation of compliance", "Evaluating compliance with legal requirements", 4.0, 31),
+    SampleClause("9.2", "Internal audit", "Conducting internal audits", 3.5, 30),
+    SampleClause("9.3", "Management review", "Top management reviews of OH&S system", 3.5, 30),
     
-    print(f"✓ ISNetworld standard loaded successfully with {len(requirements)} requirements")
-    print(f"  Standard ID: {standard_id}")
+    # Improvement
+    SampleClause("10", "Improvement", "Incident, nonconformity and continual improvement", 4.0, None),
+    SampleClause("10.1", "General", "Determining opportunities for improvement", 3.0, 36),
+    SampleClause("10.2", "Incident, nonconformity and corrective action", "Responding to incidents and nonconformities", 4.5, 36),
+    SampleClause("10.3", "Continual improvement", "Continually improving suitability, adequacy and effectiveness", 3.5, 36),
+)
 
-def create_sample_folder_structure():
-    """Create a sample folder structure guide"""
-    folder_structure = """
+# ISNetworld requirements (simplified)
+ISNETWORLD_REQUIREMENTS = (
+    SampleClause("1", "Safety Management System", "Overall safety management program", 4.0),
+    SampleClause("2", "Written Safety Programs", "Required written safety programs and procedures", 4.5),
+    SampleClause("3", "Training Programs", "Employee safety training and competency", 4.0),
+    SampleClause("4", "Incident Management", "Accident investigation and reporting", 3.5),
+    SampleClause("5", "Drug and Alcohol Program", "Substance abuse prevention program", 3.0),
+    SampleClause("6", "Safety Meetings", "Regular safety meeting documentation", 2.5),
+    SampleClause("7", "Equipment Inspection", "Equipment maintenance and inspection programs", 3.5),
+    SampleClause("8", "Emergency Response", "Emergency action plans and procedures", 3.0),
+    SampleClause("9", "Contractor Management", "Subcontractor safety management", 3.0),
+    SampleClause("10", "Insurance and Compliance", "Insurance certificates and regulatory compliance", 4.0),
+)
+
+# Folder layout guide printed at the end of setup, pre-encoded once at import
+FOLDER_GUIDE = """
 Sample Folder Structure for Compliance Documents:
 =================================================
 
@@ -329,35 +143,326 @@ Tips for Document Naming:
 - Use descriptive names that match clause titles
 - Keep consistent naming conventions
 - Use folders to organize by major elements
+
+""".encode("utf-8")
+
+# Full schema, compiled and run as one script. STRICT tables store declared
+# types as-is instead of applying column affinity on every write.
+SCHEMA_SQL = """
+    BEGIN;
+    
+    -- Standards table
+    CREATE TABLE IF NOT EXISTS standards (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        version TEXT,
+        description TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    ) STRICT;
+    
+    -- Clauses/Requirements table
+    CREATE TABLE IF NOT EXISTS clauses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        standard_id INTEGER NOT NULL,
+        clause_number TEXT NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        weight REAL NOT NULL DEFAULT 1.0 CHECK (weight >= 0),
+        parent_clause_id INTEGER,
+        FOREIGN KEY (standard_id) REFERENCES standards(id),
+        FOREIGN KEY (parent_clause_id) REFERENCES clauses(id)
+    ) STRICT;
+    
+    -- A standard lists each clause number once (same unique index as backend.init_database);
+    -- created with the table because the loaders' ON CONFLICT relies on it
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_clauses_standard_number
+    ON clauses(standard_id, clause_number);
+    
+    -- Documents table
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clause_id INTEGER NOT NULL,
+        file_name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        file_hash TEXT,
+        document_type TEXT,
+        status TEXT DEFAULT 'active',
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        last_scanned TEXT,
+        FOREIGN KEY (clause_id) REFERENCES clauses(id)
+    ) STRICT;
+    
+    -- Document revisions table
+    CREATE TABLE IF NOT EXISTS document_revisions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        document_id INTEGER NOT NULL,
+        revision_number INTEGER NOT NULL,
+        file_path TEXT NOT NULL,
+        file_hash TEXT NOT NULL,
+        notes TEXT,
+        created_by TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (document_id) REFERENCES documents(id)
+    ) STRICT;
+    
+    -- Scan history table
+    CREATE TABLE IF NOT EXISTS scan_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        standard_id INTEGER NOT NULL,
+        folder_path TEXT NOT NULL,
+        documents_found INTEGER NOT NULL DEFAULT 0,
+        scan_duration REAL,
+        started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        completed_at TEXT,
+        FOREIGN KEY (standard_id) REFERENCES standards(id)
+    ) STRICT;
+    
+    -- User corrections/learning table
+    CREATE TABLE IF NOT EXISTS user_corrections (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        original_document_id INTEGER,
+        corrected_document_id INTEGER NOT NULL,
+        clause_id INTEGER NOT NULL,
+        reason TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (original_document_id) REFERENCES documents(id),
+        FOREIGN KEY (corrected_document_id) REFERENCES documents(id),
+        FOREIGN KEY (clause_id) REFERENCES clauses(id)
+    ) STRICT;
+    
+    -- AI configuration table
+    CREATE TABLE IF NOT EXISTS ai_config (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        provider TEXT NOT NULL,
+        api_key TEXT NOT NULL,
+        model_name TEXT,
+        is_active INTEGER NOT NULL DEFAULT 0 CHECK (is_active IN (0, 1)),
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    ) STRICT;
+    
+    -- Monitored folders table
+    CREATE TABLE IF NOT EXISTS monitored_folders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        standard_id INTEGER NOT NULL,
+        folder_path TEXT NOT NULL UNIQUE,
+        is_active INTEGER NOT NULL DEFAULT 1 CHECK (is_active IN (0, 1)),
+        last_scan TEXT,
+        poll_interval INTEGER NOT NULL DEFAULT 60 CHECK (poll_interval > 0),
+        FOREIGN KEY (standard_id) REFERENCES standards(id)
+    ) STRICT;
+    
+    COMMIT;
 """
-    print(folder_structure)
+
+# STRICT needs SQLite 3.37+; older versions get the same columns without it
+if sqlite3.sqlite_version_info < (3, 37, 0):
+    SCHEMA_SQL = SCHEMA_SQL.replace(") STRICT;", ");")
+
+def init_database(conn):
+    """Initialize SQLite database with required tables"""
+    # executescript commits any open transaction first, so the schema runs
+    # as its own transaction ahead of the sample data load
+    conn.executescript(SCHEMA_SQL)
+    
+    print("✓ Database tables created successfully")
+
+def create_indexes(conn):
+    """Create the backend's lookup indexes once the sample data is in"""
+    cursor = conn.cursor()
+    
+    # Same definitions as backend.init_database, built after the bulk load so
+    # the inserts above don't pay for index maintenance
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_docs_clause_status_created
+        ON documents(clause_id, status, created_at DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_revisions_doc
+        ON document_revisions(document_id, revision_number DESC)
+    """)
+    
+    # Refresh planner statistics so the new indexes are used
+    cursor.execute("ANALYZE")
+    print("✓ Indexes created successfully")
+
+def upsert_standard(cursor, name, version, description):
+    """Create or update a standard by name and return its id"""
+    if HAS_RETURNING:
+        cursor.execute("""
+            INSERT INTO standards (name, version, description)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET version = excluded.version
+            RETURNING id
+        """, (name, version, description))
+    else:
+        cursor.execute("""
+            INSERT OR IGNORE INTO standards (name, version, description)
+            VALUES (?, ?, ?)
+        """, (name, version, description))
+        # Only look the id up when the row already existed
+        if cursor.rowcount == 1:
+            return cursor.lastrowid
+        cursor.execute("SELECT id FROM standards WHERE name = ?", (name,))
+    
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+def load_iso45001_sample(conn):
+    """Load ISO 45001 sample standard and clauses"""
+    cursor = conn.cursor()
+    
+    # Create ISO 45001 standard
+    standard_id = upsert_standard(
+        cursor,
+        "ISO 45001",
+        "2018",
+        "Occupational health and safety management systems - Requirements with guidance for use"
+    )
+    
+    if not standard_id:
+        raise Exception("Failed to create ISO 45001 standard")
+    
+    # Parents always precede their children in ISO45001_CLAUSES, so a single pass in
+    # order resolves every parent id. RETURNING hands back each new id from the INSERT itself.
+    insert_sql = """
+        INSERT INTO clauses (standard_id, clause_number, title, description, weight, parent_clause_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
+    """
+    if HAS_RETURNING:
+        insert_sql += "RETURNING id"
+    
+    # Database ids by row index into ISO45001_CLAUSES
+    ids = []
+    # Bound once outside the per-row loop
+    execute = cursor.execute
+    fetchone = cursor.fetchone
+    for clause in ISO45001_CLAUSES:
+        parent_id = None if clause.parent is None else ids[clause.parent]
+        execute(insert_sql, (standard_id, clause.number, clause.title, clause.description, clause.weight, parent_id))
+        if HAS_RETURNING:
+            row = fetchone()
+        else:
+            row = (cursor.lastrowid,) if cursor.rowcount == 1 else None
+        
+        if row is None:
+            # Kept from an earlier run
+            execute(
+                "SELECT id FROM clauses WHERE standard_id = ? AND clause_number = ?",
+                (standard_id, clause.number)
+            )
+            row = fetchone()
+        ids.append(row[0])
+    
+    print(f"✓ ISO 45001 standard loaded successfully with {len(ISO45001_CLAUSES)} clauses")
+    print(f"  Standard ID: {standard_id}")
+
+def load_isnetworld_sample(conn):
+    """Load ISNetworld sample standard"""
+    cursor = conn.cursor()
+    
+    standard_id = upsert_standard(
+        cursor,
+        "ISNetworld",
+        "2024",
+        "ISNetworld contractor safety compliance requirements"
+    )
+    
+    if not standard_id:
+        raise Exception("Failed to create ISNetworld standard")
+    
+    cursor.executemany("""
+        INSERT INTO clauses (standard_id, clause_number, title, description, weight)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
+    """, [
+        (standard_id, requirement.number, requirement.title, requirement.description, requirement.weight)
+        for requirement in ISNETWORLD_REQUIREMENTS
+    ])
+    
+    print(f"✓ ISNetworld standard loaded successfully with {len(ISNETWORLD_REQUIREMENTS)} requirements")
+    print(f"  Standard ID: {standard_id}")
+
+def connect_staging():
+    """In-memory connection for building a new database before it goes to disk"""
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+def save_to_disk(conn):
+    """Copy a staged in-memory database to DB_PATH with the backup API"""
+    disk = db.connect()
+    conn.backup(disk)
+    disk.close()
+
+def create_sample_folder_structure():
+    """Print the sample folder structure guide"""
+    out = getattr(sys.stdout, "buffer", None)
+    if out is None:
+        print(FOLDER_GUIDE.decode("utf-8"), end="")
+        return
+    # Flush pending text first so the guide lands after the earlier output
+    sys.stdout.flush()
+    out.write(FOLDER_GUIDE)
+    out.flush()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set up the compliance database with sample standards")
+    existing = parser.add_mutually_exclusive_group()
+    existing.add_argument("--force", action="store_true",
+                          help="delete an existing database and recreate it")
+    existing.add_argument("--keep", action="store_true",
+                          help="leave an existing database untouched and exit")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Compliance Document Manager - Database Setup")
     print("=" * 60)
     print()
     
-    # Check if database already exists
+    # By default an existing database is updated in place rather than deleted and rebuilt
     if os.path.exists(DB_PATH):
-        response = input(f"Database '{DB_PATH}' already exists. Delete and recreate? (y/n): ")
-        if response.lower() == 'y':
-            os.remove(DB_PATH)
+        if args.keep:
+            print(f"Database '{DB_PATH}' already exists. Keeping it unchanged.")
+            exit(0)
+        elif args.force:
+            for path in (DB_PATH, DB_PATH + "-wal", DB_PATH + "-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
             print(f"✓ Deleted existing database")
         else:
-            print("Keeping existing database. Exiting.")
-            exit(0)
+            print(f"Database '{DB_PATH}' already exists - updating it in place")
+        print()
     
     print("Loading sample data...")
     print()
     
+    # One connection for the whole setup run; schema and sample data each commit once.
+    # A new database is staged in memory and written out in a single backup pass,
+    # while an existing one is updated in place so its documents and history are kept.
+    staged = not os.path.exists(DB_PATH)
+    conn = connect_staging() if staged else db.connect()
+    
     try:
         # Initialize database structure
-        init_database()
+        init_database(conn)
+        
+        with db.transaction(conn):
+            # Load each sample standard unless an earlier run already did
+            cursor = conn.cursor()
+            for name, loader in (("ISO 45001", load_iso45001_sample),
+                                 ("ISNetworld", load_isnetworld_sample)):
+                cursor.execute("SELECT COUNT(*) FROM standards WHERE name = ?", (name,))
+                if cursor.fetchone()[0]:
+                    print(f"✓ {name} standard already loaded - skipping")
+                else:
+                    loader(conn)
+            
+            # Index after loading
+            create_indexes(conn)
         
-        # Load sample standards
-        load_iso45001_sample()
-        load_isnetworld_sample()
+        if staged:
+            save_to_disk(conn)
         
         print()
         print("=" * 60)
@@ -375,12 +480,9 @@ if __name__ == "__main__":
         print()
         
         # Verify database contents
-        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM standards")
-        std_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM clauses")
-        clause_count = cursor.fetchone()[0]
+        cursor.execute("SELECT (SELECT COUNT(*) FROM standards), (SELECT COUNT(*) FROM clauses)")
+        std_count, clause_count = cursor.fetchone()
         conn.close()
         
         print(f"Database verification:")